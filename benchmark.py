@@ -0,0 +1,326 @@
+"""Offline benchmark for the DEXScreener scan pipeline.
+
+Serves synthetic or recorded `pairs` payloads from a local DEXScreener stub and runs one
+DexscreenerBot.scan over them (fetch, JSON parsing and the whole pipeline), with Rugcheck,
+Pocket Universe and Telegram answered by local stub servers too, and reports
+tokens/sec, per-stage time, peak memory and database write throughput as JSON that can
+be compared against an earlier run.
+
+    python benchmark.py --sizes 100,1000,10000 --output bench_results.json
+    python benchmark.py --payload recorded.json --compare bench_results.json
+    python benchmark.py --record recorded.json  # capture a live payload once, online
+"""
+import argparse
+import gc
+import http.server
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from urllib.parse import urlparse
+
+import requests
+import yaml
+
+from bot import DexscreenerBot
+
+def synthetic_pairs(count, seed=0, now_ms=None):
+    """A deterministic DEXScreener `pairs` list; ages and trade times are relative to now_ms."""
+    rng = random.Random(f"{seed}:{count}")
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    pairs = []
+    for i in range(count):
+        address = f"BenchPair{seed}x{i:06d}"
+        total_supply = rng.choice([1e6, 1e9])
+        recent = []
+        # A few pairs get coordinated buys from several wallets inside the bundle window
+        wallets = rng.randrange(3, 8) if rng.random() < 0.05 else rng.randrange(0, 3)
+        for w in range(wallets):
+            recent.append({
+                'hash': f"{address}-tx{w}",
+                'buyer_wallet': f"BenchWallet{rng.randrange(count * 4 + 10)}",
+                'amount': total_supply * rng.choice([0.001, 0.01, 0.03]),
+                'timestamp': now_ms - rng.randrange(0, 50) * 1000
+            })
+        pairs.append({
+            'pairAddress': address,
+            'baseToken': {'name': f"Bench Token {i}", 'symbol': f"BT{i}"},
+            'marketCap': rng.choice([2e5, 8e5, 1.5e6, 4e6, 2e7]),
+            'volume': {'h24': rng.choice([1e4, 2e5, 1e6, 4e6, 8e6])},
+            'liquidity': {'usd': rng.choice([5e3, 3e4, 6e4, 2.5e5])},
+            'priceUsd': f"{rng.uniform(0.00001, 5):.8f}",
+            'priceChange': {'h24': rng.choice([-95, -30, -5, 0, 12, 80, 650])},
+            'pairCreatedAt': now_ms - int(rng.choice([0.5, 3, 12, 30, 200]) * 3600 * 1000),
+            'totalSupply': total_supply,
+            'txns': {'h24': {'buys': rng.randrange(200), 'sells': rng.randrange(200)}, 'recent': recent},
+            'dev_address': '0xBadDevAddress1' if rng.random() < 0.01 else f"BenchDev{rng.randrange(count + 1)}"
+        })
+    return pairs
+
+def load_payload(path):
+    with open(path, 'r') as file:
+        data = json.load(file)
+    if isinstance(data, dict):
+        return data.get('pairs') or []
+    return data
+
+def record_payload(url, path):
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    pairs = response.json().get('pairs') or []
+    with open(path, 'w') as file:
+        json.dump({'pairs': pairs, 'recorded_at': int(time.time())}, file)
+    print(f"Recorded {len(pairs)} pairs from {url} to {path}")
+
+class StubServer:
+    """A local HTTP endpoint that answers after latency_ms and fails error_rate of requests with a 500."""
+
+    def __init__(self, name, respond, latency_ms=0, error_rate=0.0, seed=0):
+        self.name = name
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        rng = random.Random(f"{seed}:{name}")
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _answer(handler):
+                length = int(handler.headers.get('Content-Length') or 0)
+                body = json.loads(handler.rfile.read(length) or b'{}') if length else {}
+                if latency_ms:
+                    time.sleep(latency_ms / 1000)
+                with stub.lock:
+                    stub.requests += 1
+                    failed = rng.random() < error_rate
+                    stub.errors += failed
+                status, payload = (500, {'error': 'stub failure'}) if failed else (200, respond(handler.path, body))
+                # Large payloads are encoded once up front and served as bytes
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+                handler.send_response(status)
+                handler.send_header('Content-Type', 'application/json')
+                handler.send_header('Content-Length', str(len(data)))
+                handler.end_headers()
+                handler.wfile.write(data)
+
+            do_GET = _answer
+            do_POST = _answer
+
+            def log_message(handler, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name=f"stub-{name}", daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def stats(self):
+        with self.lock:
+            return {'requests': self.requests, 'errors': self.errors}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def rugcheck_answer(path, body):
+    address = path.rstrip('/').rsplit('/', 1)[-1]
+    good = zlib.crc32(address.encode('utf-8')) % 10 != 0
+    return {'status': 'Good' if good else 'Warning', 'details': 'Stub verdict'}
+
+def pocket_universe_answer(path, body):
+    return {'is_fake_volume': zlib.crc32(str(body.get('address')).encode('utf-8')) % 20 == 0}
+
+def telegram_answer(path, body):
+    return {'ok': True, 'result': {}}
+
+def start_stubs(args):
+    return {
+        'rugcheck': StubServer('rugcheck', rugcheck_answer, args.rugcheck_latency, args.rugcheck_error_rate, args.seed),
+        'pocket_universe': StubServer(
+            'pocket_universe', pocket_universe_answer, args.pocket_universe_latency, args.pocket_universe_error_rate, args.seed
+        ),
+        'telegram': StubServer('telegram', telegram_answer, args.telegram_latency, args.telegram_error_rate, args.seed)
+    }
+
+def write_config(args, workdir, stubs):
+    with open(args.config, 'r') as file:
+        config = yaml.safe_load(file)
+    config['database']['name'] = os.path.join(workdir, 'bench.db')
+    config['blacklist']['file'] = os.path.join(workdir, 'blacklist.yaml')
+    config['rugcheck']['api_url'] = stubs['rugcheck'].url
+    config['rugcheck']['api_key'] = config['rugcheck'].get('api_key') or 'bench'
+    config['dexscreener']['pocket_universe_api'] = f"{stubs['pocket_universe'].url}/v1/check-volume"
+    endpoints = [f"{stubs['dexscreener'].url}/pairs/{i}" for i in range(args.endpoints)]
+    config['dexscreener'].update(
+        api_url=endpoints[0], endpoints=endpoints, pairs_url=f"{stubs['dexscreener'].url}/pairs",
+        rate_limit=max(5, args.endpoints), burst=max(5, args.endpoints)
+    )
+    config['telegram']['api_url'] = stubs['telegram'].url
+    notifications = config['telegram'].setdefault('notifications', {}) or {}
+    notifications.update({'coalesce_ms': 100, 'min_interval': 0})
+    config['telegram']['notifications'] = notifications
+    config['monitoring'] = dict(config.get('monitoring') or {}, metrics_port=0, metrics_file=None, log_level=args.log_level)
+    config['sharding'] = dict(config.get('sharding') or {}, workers=args.workers)
+    path = os.path.join(workdir, 'config.yaml')
+    with open(path, 'w') as file:
+        yaml.dump(config, file)
+    return path
+
+def run_case(name, pairs, args, trace_memory=False):
+    workdir = tempfile.mkdtemp(prefix='dexscanner-bench-')
+    stubs = start_stubs(args)
+    # The payload is split over --endpoints lists, which the bot polls concurrently (or one per shard)
+    payloads = [json.dumps({'pairs': pairs[i::args.endpoints]}).encode('utf-8') for i in range(args.endpoints)]
+    stubs['dexscreener'] = StubServer('dexscreener', lambda path, body: payloads[int(path.rstrip('/').rsplit('/', 1)[-1])])
+    bot = None
+    try:
+        bot = DexscreenerBot(write_config(args, workdir, stubs))
+        gc.collect()
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        bot.scan()
+        bot.trade_executor.shutdown(wait=True)
+        bot.flush()
+        elapsed = time.perf_counter() - started
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        hosts = {urlparse(stub.url).netloc: service for service, stub in stubs.items()}
+        return {
+            'case': name,
+            'pairs': len(pairs),
+            'seconds': elapsed,
+            'tokens_per_sec': len(pairs) / elapsed if elapsed else None,
+            'stages': {labels[0]: seconds for labels, (seconds, _) in sorted(bot.metrics.totals('stage_seconds').items())},
+            'http_seconds': {
+                hosts.get(labels[0], labels[0]): seconds
+                for labels, (seconds, _) in sorted(bot.metrics.totals('http_request_seconds').items())
+            },
+            'db_rows': bot.db.rows_written,
+            'db_write_seconds': bot.db.write_seconds,
+            'db_rows_per_sec': bot.db.rows_written / bot.db.write_seconds if bot.db.write_seconds else None,
+            'peak_memory_bytes': peak,
+            'stubs': {service: stub.stats() for service, stub in stubs.items()}
+        }
+    finally:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if bot is not None:
+            bot.close()
+        for stub in stubs.values():
+            stub.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def run_benchmark(cases, args):
+    results = []
+    for name, load in cases:
+        # Synthetic payloads are rebuilt per run so trade times stay inside the bundle window
+        runs = [run_case(name, load(), args) for _ in range(args.repeat)]
+        # The median run by throughput stands for the case; the rest only narrow the noise
+        runs.sort(key=lambda run: run['seconds'])
+        result = runs[len(runs) // 2]
+        result['runs'] = [run['seconds'] for run in runs]
+        if not args.no_memory:
+            result['peak_memory_bytes'] = run_case(name, load(), args, trace_memory=True)['peak_memory_bytes']
+        results.append(result)
+        print_result(result)
+    return results
+
+def print_result(result):
+    memory = result['peak_memory_bytes']
+    memory = f"{memory / 1024 / 1024:.1f} MiB peak" if memory is not None else "memory not traced"
+    db_rate = result['db_rows_per_sec']
+    db_rate = f"{db_rate:,.0f} rows/s" if db_rate else "n/a"
+    print(f"\n{result['case']}: {result['pairs']} pairs in {result['seconds']:.3f}s "
+          f"({result['tokens_per_sec']:,.0f} tokens/s), {memory}")
+    print(f"  database: {result['db_rows']} rows in {result['db_write_seconds']:.3f}s ({db_rate})")
+    for stage, seconds in sorted(result['stages'].items(), key=lambda item: -item[1]):
+        print(f"  {stage}: {seconds:.3f}s")
+
+def compare(results, baseline_path, threshold):
+    """Print throughput changes against an earlier results file; returns the regressed cases."""
+    with open(baseline_path, 'r') as file:
+        baseline = {result['case']: result for result in json.load(file)['results']}
+    regressions = []
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        previous = baseline.get(result['case'])
+        if previous is None or not previous.get('tokens_per_sec') or not result['tokens_per_sec']:
+            print(f"  {result['case']}: no baseline")
+            continue
+        change = result['tokens_per_sec'] / previous['tokens_per_sec'] - 1
+        regressed = change < -threshold
+        print(f"  {result['case']}: {previous['tokens_per_sec']:,.0f} -> {result['tokens_per_sec']:,.0f} tokens/s "
+              f"({change:+.1%}){' REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(result['case'])
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scan pipeline offline against local API stubs.")
+    parser.add_argument('--config', default='config.yaml', help="Base config; API URLs and the database are overridden")
+    parser.add_argument('--sizes', default='100,1000,10000,100000', help="Comma-separated synthetic payload sizes ('' for none)")
+    parser.add_argument('--payload', action='append', default=[], help="Recorded pairs payload (JSON); repeatable")
+    parser.add_argument('--record', metavar='PATH', help="Fetch dexscreener.api_url once and save it as a payload, then exit")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help="Timed runs per case; the median is reported")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the separate tracemalloc pass")
+    parser.add_argument('--log-level', default='ERROR')
+    parser.add_argument('--workers', type=int, default=0, help="Shard worker processes (sharding.workers)")
+    parser.add_argument('--endpoints', type=int, default=4, help="Endpoint lists the payload is split across")
+    for service, latency in (('rugcheck', 20), ('pocket-universe', 20), ('telegram', 5)):
+        parser.add_argument(f"--{service}-latency", type=float, default=latency, help="Stub response delay in ms")
+        parser.add_argument(f"--{service}-error-rate", type=float, default=0.0, help="Fraction of stub requests answered with 500")
+    parser.add_argument('--output', default='bench_results.json', help="Where to write the JSON results")
+    parser.add_argument('--compare', metavar='PATH', help="Earlier results file to compare throughput against")
+    parser.add_argument('--threshold', type=float, default=0.1, help="Throughput drop that counts as a regression")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.record:
+        with open(args.config, 'r') as file:
+            record_payload(yaml.safe_load(file)['dexscreener']['api_url'], args.record)
+        return 0
+
+    cases = [
+        (f"synthetic-{size}", lambda size=int(size): synthetic_pairs(size, args.seed))
+        for size in args.sizes.split(',') if size.strip()
+    ]
+    for path in args.payload:
+        pairs = load_payload(path)
+        cases.append((os.path.basename(path), lambda pairs=pairs: pairs))
+    results = run_benchmark(cases, args)
+
+    output = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'record')},
+        'results': results
+    }
+    with open(args.output, 'w') as file:
+        json.dump(output, file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
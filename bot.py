@@ -1,18 +1,436 @@
+import bisect
+import codecs
+import contextlib
+import cProfile
+import heapq
+import http.server
+import itertools
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import numpy as np
+import operator
+import os
+import queue
 import requests
+import signal
+import sys
 import yaml
 import sqlite3
 import threading
 import time
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger('dexscanner')
+
+def configure_logging(config=None):
+    """Send the bot's log records through a buffer that is written out once per cycle.
+
+    Records are held until the buffer fills, an ERROR arrives or the handler is
+    flushed, so per-token messages no longer cost a write each.
+    """
+    config = config or {}
+    level = getattr(logging, str(config.get('log_level', 'INFO')).upper(), logging.INFO)
+    target = logging.StreamHandler(sys.stdout)
+    target.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+    handler = logging.handlers.MemoryHandler(config.get('log_buffer', 200), flushLevel=logging.ERROR, target=target)
+    for existing in list(logger.handlers):
+        logger.removeHandler(existing)
+        existing.close()
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    return handler
+
+class Metrics:
+    """Counters, gauges and latency histograms, rendered in the Prometheus text format."""
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self, prefix='dexscanner'):
+        self.prefix = prefix
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                # One slot per bucket plus +Inf, then sum and count
+                histogram = self.histograms[key] = [0] * (len(self.BUCKETS) + 3)
+            histogram[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def totals(self, name):
+        """(sum, count) of every series of a histogram, keyed by its label values."""
+        with self.lock:
+            return {
+                tuple(value for _, value in labels): (values[-2], values[-1])
+                for (series, labels), values in self.histograms.items() if series == name
+            }
+
+    def counts(self, name):
+        """Value of every series of a counter, keyed by its label values."""
+        with self.lock:
+            return {
+                tuple(value for _, value in labels): value_total
+                for (series, labels), value_total in self.counters.items() if series == name
+            }
+
+    def gauge(self, name, read, **labels):
+        """Register a callable that is read each time the metrics are rendered."""
+        with self.lock:
+            self.gauges[self._key(name, labels)] = read
+
+    def read_gauges(self):
+        """Current value of every gauge that can be read, keyed like the counters."""
+        with self.lock:
+            gauges = list(self.gauges.items())
+        values = {}
+        for key, read in gauges:
+            try:
+                values[key] = float(read())
+            except Exception:
+                continue
+        return values
+
+    def take(self):
+        """Counters and histograms recorded since the last take; shard workers ship these deltas."""
+        with self.lock:
+            counters, histograms = self.counters, self.histograms
+            self.counters, self.histograms = {}, {}
+        return counters, histograms
+
+    def merge(self, counters, histograms):
+        with self.lock:
+            for key, value in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, values in histograms.items():
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    self.histograms[key] = list(values)
+                else:
+                    for i, value in enumerate(values):
+                        histogram[i] += value
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        labels = tuple(labels) + tuple(extra)
+        if not labels:
+            return ''
+        return '{' + ','.join('%s="%s"' % (key, value.replace('\\', '\\\\').replace('"', '\\"')) for key, value in labels) + '}'
+
+    def render(self):
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, list(values)) for key, values in self.histograms.items())
+            gauges = sorted(self.gauges.items(), key=lambda item: item[0])
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            name = f"{self.prefix}_{name}"
+            declare(name, 'counter')
+            lines.append(f"{name}{self._labels(labels)} {value}")
+        for (name, labels), read in gauges:
+            try:
+                value = float(read())
+            except Exception:
+                continue
+            name = f"{self.prefix}_{name}"
+            declare(name, 'gauge')
+            lines.append(f"{name}{self._labels(labels)} {value}")
+        for (name, labels), values in histograms:
+            name = f"{self.prefix}_{name}"
+            declare(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS + ('+Inf',), values):
+                cumulative += count
+                lines.append(f"{name}_bucket{self._labels(labels, (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{self._labels(labels)} {values[-2]}")
+            lines.append(f"{name}_count{self._labels(labels)} {values[-1]}")
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path):
+        # Write then rename so a scraper never reads a half-written file
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as file:
+            file.write(self.render())
+        os.replace(temp_path, path)
+
+class MetricsServer:
+    """Serves /metrics as Prometheus text; GET /profile asks for a profile of the next cycle."""
+
+    def __init__(self, metrics, host='127.0.0.1', port=9108, on_profile=None):
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split('?')[0] == '/metrics':
+                    status, body = 200, metrics.render()
+                elif handler.path.split('?')[0] == '/profile' and on_profile is not None:
+                    on_profile()
+                    status, body = 202, 'The next cycle will be profiled.\n'
+                else:
+                    status, body = 404, 'Not found\n'
+                payload = body.encode('utf-8')
+                handler.send_response(status)
+                handler.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                handler.send_header('Content-Length', str(len(payload)))
+                handler.end_headers()
+                handler.wfile.write(payload)
+
+            def log_message(handler, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class CircuitOpenError(requests.RequestException):
+    pass
+
+def is_unavailable(error):
+    """True for request errors that say nothing about the token: an open circuit, a timeout or a 429."""
+    if isinstance(error, (CircuitOpenError, requests.Timeout)):
+        return True
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code == 429
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Half-open: let a single probe through per reset window
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+class HttpClient:
+    def __init__(self, config=None, metrics=None):
+        config = config or {}
+        self.metrics = metrics
+        self.timeout = config.get('timeout', 10)
+        pool_size = config.get('pool_size', 32)
+        breaker_config = config.get('circuit_breaker', {}) or {}
+        self.failure_threshold = breaker_config.get('failure_threshold', 5)
+        self.reset_timeout = breaker_config.get('reset_timeout', 30)
+        self.breakers = {}
+        self.lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _breaker(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            breaker = self.breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self.breakers[host] = breaker
+            return breaker
+
+    def request(self, method, url, **kwargs):
+        host = urlparse(url).netloc
+        breaker = self._breaker(url)
+        if not breaker.allow():
+            self._count('http_errors_total', host=host, kind='circuit_open')
+            raise CircuitOpenError(f"Circuit open for {host}")
+        kwargs.setdefault('timeout', self.timeout)
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.RequestException as e:
+            breaker.record_failure()
+            self._count('http_errors_total', host=host, kind='timeout' if isinstance(e, requests.Timeout) else 'error')
+            raise
+        if self.metrics is not None:
+            self.metrics.observe('http_request_seconds', time.perf_counter() - started, host=host)
+            self.metrics.inc('http_requests_total', host=host, status=response.status_code)
+        # Only server-side trouble trips the breaker; 4xx is a per-request answer
+        if response.status_code >= 500 or response.status_code == 429:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def _count(self, name, **labels):
+        if self.metrics is not None:
+            self.metrics.inc(name, **labels)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+class TokenRecord:
+    """One pair as the pipeline sees it, parsed once from the DEXScreener payload.
+
+    Slots keep a tracked token at a fraction of a dict's size, and `as_row` yields the
+    tokens-table row in column order so the database binds it as-is.
+    """
+
+    __slots__ = (
+        'address', 'name', 'symbol', 'market_cap', 'volume', 'liquidity', 'price_usd',
+        'price_change_24h', 'pair_created_at', 'total_supply', 'trades', 'recent',
+        'status', 'listed_on_cex', 'dev_address', 'volume_h6'
+    )
+
+    def __init__(self, address, name=None, symbol=None, market_cap=0, volume=0, liquidity=0, price_usd=0,
+                 price_change_24h=0, pair_created_at=0, total_supply=1, trades=0, recent=(),
+                 status=None, listed_on_cex=False, dev_address=None, volume_h6=0):
+        self.address = address
+        self.name = name
+        self.symbol = symbol
+        self.market_cap = market_cap
+        self.volume = volume
+        self.liquidity = liquidity
+        self.price_usd = price_usd
+        self.price_change_24h = price_change_24h
+        self.pair_created_at = pair_created_at
+        self.total_supply = total_supply
+        self.trades = trades
+        self.recent = recent
+        self.status = status
+        self.listed_on_cex = listed_on_cex
+        self.dev_address = dev_address
+        self.volume_h6 = volume_h6
+
+    @classmethod
+    def from_pair(cls, pair, listed_on_cex=False):
+        base_token = pair.get('baseToken', {})
+        txns = pair.get('txns', {})
+        try:
+            h24 = txns.get('h24', {})
+            trades = h24.get('buys', 0) + h24.get('sells', 0)
+        except (AttributeError, TypeError):
+            # Left for the fake-volume check to report as an error
+            trades = None
+        return cls(
+            pair.get('pairAddress'),
+            base_token.get('name'),
+            base_token.get('symbol'),
+            pair.get('marketCap', 0),
+            pair.get('volume', {}).get('h24', 0),
+            pair.get('liquidity', {}).get('usd', 0),
+            pair.get('priceUsd', 0),
+            pair.get('priceChange', {}).get('h24', 0),
+            pair.get('pairCreatedAt', 0),
+            pair.get('totalSupply', 1),
+            trades,
+            txns.get('recent', []) if isinstance(txns, dict) else [],
+            listed_on_cex=listed_on_cex,
+            dev_address=pair.get('dev_address')
+        )
+
+    def as_row(self, last_updated):
+        return (
+            self.address, self.name, self.symbol, self.market_cap, self.volume, self.liquidity,
+            self.price_usd, self.price_change_24h, self.pair_created_at,
+            'unknown' if self.status is None else self.status, self.listed_on_cex,
+            self.dev_address, last_updated
+        )
 
 class Database:
-    def __init__(self, db_name):
-        self.conn = sqlite3.connect(db_name)
-        self.cursor = self.conn.cursor()
+    SNAPSHOT_FIELDS = ('price', 'volume', 'liquidity', 'market_cap')
+
+    def __init__(self, db_name, batch_size=500, flush_interval_ms=1000, write_queue=None):
+        # The connection is shared by the scan loop, the Rugcheck workers and the
+        # flusher thread; every statement runs under self.lock on its own cursor.
+        self.conn = sqlite3.connect(db_name, check_same_thread=False)
+        self.lock = threading.RLock()
+        # In sharded mode queued rows are handed to the writer process instead of committed here
+        self.write_queue = write_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.pending = {}
+        self.pending_rows = 0
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.write_errors = 0
+        self.write_seconds = 0.0
+        # After a busy/locked failure, size-triggered flushes wait until then instead of retrying per row
+        self.retry_after = 0
+        self.configure()
         self.create_tables()
 
+        self.stop_event = threading.Event()
+        self.flusher = None
+        if self.batch_size > 1 and self.flush_interval > 0:
+            self.flusher = threading.Thread(target=self._flush_periodically, name='db-flusher', daemon=True)
+            self.flusher.start()
+
+    def configure(self):
+        # WAL keeps readers off the writer's back; NORMAL syncs at checkpoints
+        # instead of every commit, which is safe under WAL.
+        # Set first so the other statements wait out a concurrent writer (sharded mode)
+        self.conn.execute('PRAGMA busy_timeout=5000')
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA temp_store=MEMORY')
+        self.conn.execute('PRAGMA cache_size=-16000')
+
     def create_tables(self):
-        self.cursor.execute('''
+        self.conn.execute('''
             CREATE TABLE IF NOT EXISTS tokens (
                 address TEXT PRIMARY KEY,
                 name TEXT,
@@ -29,7 +447,7 @@ class Database:
                 last_updated INTEGER
             )
         ''')
-        self.cursor.execute('''
+        self.conn.execute('''
             CREATE TABLE IF NOT EXISTS patterns (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 token_address TEXT,
@@ -39,56 +457,683 @@ class Database:
                 FOREIGN KEY (token_address) REFERENCES tokens (address)
             )
         ''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS blacklist_journal (
+                kind TEXT,
+                address TEXT,
+                reason TEXT,
+                added_at INTEGER,
+                PRIMARY KEY (kind, address)
+            )
+        ''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS pair_fingerprints (
+                address TEXT PRIMARY KEY,
+                price_usd REAL,
+                volume REAL,
+                liquidity REAL,
+                market_cap REAL,
+                price_change_24h REAL,
+                trades INTEGER,
+                recent_digest INTEGER,
+                scanned_at INTEGER
+            )
+        ''')
+        # Columns added after the table first shipped; older rows read as NULL, i.e. changed
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(pair_fingerprints)')}
+        for column in ('trades', 'recent_digest'):
+            if column not in columns:
+                self.conn.execute(f'ALTER TABLE pair_fingerprints ADD COLUMN {column} INTEGER')
+        # Volumes are whole USD so most rows fit in a few varint bytes; price stays REAL
+        # because sub-cent token prices don't survive a fixed integer scale.
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS snapshots (
+                address TEXT,
+                ts INTEGER,
+                price REAL,
+                volume INTEGER,
+                liquidity INTEGER,
+                market_cap INTEGER,
+                PRIMARY KEY (address, ts)
+            ) WITHOUT ROWID
+        ''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS rugcheck_verdicts (
+                chain TEXT,
+                address TEXT,
+                is_good INTEGER,
+                details TEXT,
+                checked_at INTEGER,
+                PRIMARY KEY (chain, address)
+            )
+        ''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS trade_latency (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                token_address TEXT,
+                executed_at INTEGER,
+                fetch_ms REAL,
+                stages TEXT,
+                dispatch_ms REAL,
+                order_ms REAL,
+                total_ms REAL
+            )
+        ''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS analytics_state (
+                key TEXT PRIMARY KEY,
+                value INTEGER
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_patterns_token_detected ON patterns (token_address, detected_at)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_patterns_type ON patterns (pattern_type)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_tokens_market_cap ON tokens (market_cap)')
+        self.create_pattern_counts()
         self.conn.commit()
 
+    def create_pattern_counts(self):
+        # Per-type totals kept current by a trigger, so reports never count the patterns table
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pattern_counts'"
+        ).fetchone()
+        if exists:
+            return
+        self.conn.execute('''
+            CREATE TABLE pattern_counts (
+                pattern_type TEXT PRIMARY KEY,
+                count INTEGER NOT NULL
+            )
+        ''')
+        self.conn.execute('''
+            INSERT INTO pattern_counts (pattern_type, count)
+            SELECT pattern_type, COUNT(*) FROM patterns WHERE pattern_type IS NOT NULL GROUP BY pattern_type
+        ''')
+        self.conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS patterns_count_insert AFTER INSERT ON patterns
+            WHEN NEW.pattern_type IS NOT NULL
+            BEGIN
+                INSERT OR IGNORE INTO pattern_counts (pattern_type, count) VALUES (NEW.pattern_type, 0);
+                UPDATE pattern_counts SET count = count + 1 WHERE pattern_type = NEW.pattern_type;
+            END
+        ''')
+
+    def _enqueue(self, sql, params):
+        with self.lock:
+            self.pending.setdefault(sql, []).append(params)
+            self.pending_rows += 1
+            if self.pending_rows >= self.batch_size and time.monotonic() >= self.retry_after:
+                self.flush()
+
+    def flush(self):
+        """Write every queued row in a single transaction."""
+        with self.lock:
+            if not self.pending:
+                return 0
+            pending, rows = self.pending, self.pending_rows
+            self.pending, self.pending_rows = {}, 0
+            if self.write_queue is not None:
+                self.write_queue.put(pending)
+                return rows
+            return self.write_batches([pending], rows)
+
+    def write_batches(self, batches, rows):
+        """Commit queued batches (dicts of statement -> parameter rows) in one transaction, in order."""
+        with self.lock:
+            try:
+                started = time.perf_counter()
+                with self.conn:
+                    for pending in batches:
+                        for sql, params in pending.items():
+                            self.conn.executemany(sql, params)
+                self.write_seconds += time.perf_counter() - started
+                self.rows_written += rows
+                return rows
+            except sqlite3.Error as e:
+                self.write_errors += 1
+                if self._is_transient(e):
+                    # The transaction rolled back; the rows go back in front of anything queued since
+                    self._requeue(batches, rows)
+                    logger.error(f"Error flushing {rows} rows to database, retrying on the next flush: {e}")
+                    return 0
+                logger.error(f"Error flushing {rows} rows to database, retrying statement by statement: {e}")
+                return self._write_isolated(batches, rows)
+
+    def _write_isolated(self, batches, rows):
+        """Commit batches in one transaction with a savepoint per statement, falling back to
+        one row at a time for a statement that fails, so only the rows that can't be written
+        are dropped (and counted)."""
+        dropped = 0
+        try:
+            started = time.perf_counter()
+            with self.conn:
+                self.conn.execute('BEGIN')
+                for pending in batches:
+                    for sql, params in pending.items():
+                        if self._try(sql, params, many=True):
+                            continue
+                        for row in params:
+                            if not self._try(sql, row):
+                                dropped += 1
+            self.write_seconds += time.perf_counter() - started
+        except sqlite3.Error as e:
+            if self._is_transient(e):
+                self._requeue(batches, rows)
+                logger.error(f"Error flushing {rows} rows to database, retrying on the next flush: {e}")
+            else:
+                self.rows_dropped += rows
+                logger.error(f"Dropped {rows} rows that failed to write: {e}")
+            return 0
+        self.rows_written += rows - dropped
+        self.rows_dropped += dropped
+        return rows - dropped
+
+    def _try(self, sql, params, many=False):
+        """Run one statement inside a savepoint; a failure is undone and reported as False.
+        Transient (busy/locked) errors propagate, since retrying row by row won't help."""
+        self.conn.execute('SAVEPOINT isolated')
+        try:
+            if many:
+                self.conn.executemany(sql, params)
+            else:
+                self.conn.execute(sql, params)
+        except sqlite3.Error as e:
+            if self._is_transient(e):
+                raise
+            self.conn.execute('ROLLBACK TO isolated')
+            if not many:
+                logger.error(f"Dropped a row that failed to write: {e}")
+            return False
+        finally:
+            self.conn.execute('RELEASE isolated')
+        return True
+
+    @staticmethod
+    def _is_transient(error):
+        # SQLITE_BUSY / SQLITE_LOCKED (and their extended codes); the code is only exposed from Python 3.11
+        code = getattr(error, 'sqlite_errorcode', None)
+        if code is not None:
+            return code & 0xff in (5, 6)
+        return isinstance(error, sqlite3.OperationalError) and ('locked' in str(error) or 'busy' in str(error))
+
+    def _requeue(self, batches, rows):
+        with self.lock:
+            pending = {}
+            for batch in list(batches) + [self.pending]:
+                for sql, params in batch.items():
+                    pending.setdefault(sql, []).extend(params)
+            self.pending, self.pending_rows = pending, self.pending_rows + rows
+            self.retry_after = time.monotonic() + max(self.flush_interval, 1)
+
+    def _flush_periodically(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+
     def insert_or_update_token(self, token):
-        self.cursor.execute('''
+        self._enqueue('''
             INSERT OR REPLACE INTO tokens (
                 address, name, symbol, market_cap, volume, liquidity,
                 price_usd, price_change_24h, pair_created_at, status,
                 listed_on_cex, dev_address, last_updated
             ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            token['address'], token.get('name'), token.get('symbol'),
-            token.get('market_cap', 0), token.get('volume', 0),
-            token.get('liquidity', 0), token.get('price_usd', 0),
-            token.get('price_change_24h', 0), token.get('pair_created_at', 0),
-            token.get('status', 'unknown'), token.get('listed_on_cex', 0),
-            token.get('dev_address'), int(datetime.now().timestamp())
-        ))
-        self.conn.commit()
+        ''', token.as_row(int(datetime.now().timestamp())))
 
     def insert_pattern(self, token_address, pattern_type, details):
-        self.cursor.execute('''
+        self._enqueue('''
             INSERT INTO patterns (token_address, pattern_type, detected_at, details)
             VALUES (?, ?, ?, ?)
         ''', (
             token_address, pattern_type, int(datetime.now().timestamp()), details
         ))
-        self.conn.commit()
+
+    def fetch_token_schedule(self):
+        with self.lock:
+            self.flush()
+            return self.conn.execute('SELECT address, status, last_updated FROM tokens').fetchall()
+
+    def fetch_traded_addresses(self):
+        with self.lock:
+            self.flush()
+            rows = self.conn.execute('''
+                SELECT DISTINCT token_address FROM patterns WHERE pattern_type = 'buy_executed'
+            ''').fetchall()
+            return {row[0] for row in rows}
+
+    def touch_token(self, address, last_updated):
+        self._enqueue('UPDATE tokens SET last_updated = ? WHERE address = ?', (last_updated, address))
+
+    def fetch_fingerprints(self):
+        with self.lock:
+            self.flush()
+            return self.conn.execute('''
+                SELECT address, price_usd, volume, liquidity, market_cap, price_change_24h, trades, recent_digest, scanned_at
+                FROM pair_fingerprints
+            ''').fetchall()
+
+    def store_fingerprint(self, address, values, scanned_at):
+        self._enqueue('''
+            INSERT OR REPLACE INTO pair_fingerprints (
+                address, price_usd, volume, liquidity, market_cap, price_change_24h, trades, recent_digest, scanned_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (address,) + tuple(values) + (scanned_at,))
+
+    def _snapshot_column(self, field):
+        if field not in self.SNAPSHOT_FIELDS:
+            raise ValueError(f"Unknown snapshot field: {field}")
+        return field
+
+    def append_snapshot(self, row):
+        self._enqueue('''
+            INSERT OR REPLACE INTO snapshots (address, ts, price, volume, liquidity, market_cap)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', row)
+
+    def fetch_snapshot_averages(self, addresses, field, start, end):
+        column = self._snapshot_column(field)
+        averages = {}
+        with self.lock:
+            self.flush()
+            for offset in range(0, len(addresses), 500):
+                chunk = addresses[offset:offset + 500]
+                rows = self.conn.execute(f'''
+                    SELECT address, AVG({column}) FROM snapshots
+                    WHERE address IN ({','.join('?' * len(chunk))}) AND ts >= ? AND ts < ?
+                    GROUP BY address
+                ''', chunk + [start, end]).fetchall()
+                averages.update((address, value) for address, value in rows if value is not None)
+        return averages
+
+    def fetch_snapshot_latest(self, addresses, field, before):
+        column = self._snapshot_column(field)
+        latest = {}
+        with self.lock:
+            self.flush()
+            for address in addresses:
+                row = self.conn.execute(f'''
+                    SELECT {column} FROM snapshots WHERE address = ? AND ts < ?
+                    ORDER BY ts DESC LIMIT 1
+                ''', (address, before)).fetchone()
+                if row is not None and row[0] is not None:
+                    latest[address] = row[0]
+        return latest
+
+    def iter_snapshots(self, start=0, end=None, chunk_size=100000):
+        """Snapshot rows (address, ts, price, volume, liquidity, market_cap) in chunks, by pair then time."""
+        with self.lock:
+            self.flush()
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                SELECT address, ts, price, volume, liquidity, market_cap FROM snapshots
+                WHERE ts >= ? AND ts < ? ORDER BY address, ts
+            ''', (start, end if end is not None else 2 ** 62))
+        while True:
+            with self.lock:
+                rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
+
+    def fetch_token_details(self):
+        with self.lock:
+            return self.conn.execute('''
+                SELECT address, name, symbol, pair_created_at, dev_address, price_change_24h FROM tokens
+            ''').fetchall()
+
+    def _write_now(self, statements):
+        """Run (sql, params) statements in one transaction after everything queued so far.
+
+        In sharded mode they go to the writer process like any other batch, so only it
+        ever writes; returns the last statement's rowcount, or None when handed off.
+        """
+        with self.lock:
+            self.flush()
+            if self.write_queue is not None:
+                self.write_queue.put({sql: [params] for sql, params in statements})
+                return None
+            with self.conn:
+                return [self.conn.execute(sql, params).rowcount for sql, params in statements][-1]
+
+    def downsample_snapshots(self, start, end, bucket_seconds):
+        self._write_now([
+            ('''
+                INSERT OR REPLACE INTO snapshots (address, ts, price, volume, liquidity, market_cap)
+                SELECT address, ts - ts % ?1, AVG(price), CAST(AVG(volume) AS INTEGER),
+                       CAST(AVG(liquidity) AS INTEGER), CAST(AVG(market_cap) AS INTEGER)
+                FROM snapshots WHERE ts >= ?2 AND ts < ?3
+                GROUP BY address, ts - ts % ?1
+            ''', (bucket_seconds, start, end)),
+            ('''
+                DELETE FROM snapshots WHERE ts >= ? AND ts < ? AND ts % ? != 0
+            ''', (start, end, bucket_seconds))
+        ])
+
+    def purge_snapshots(self, before):
+        return self._write_now([('DELETE FROM snapshots WHERE ts < ?', (before,))])
+
+
+    def append_blacklist_journal(self, kind, address, reason):
+        self._enqueue('''
+            INSERT OR IGNORE INTO blacklist_journal (kind, address, reason, added_at)
+            VALUES (?, ?, ?, ?)
+        ''', (kind, address, reason, int(datetime.now().timestamp())))
+
+    def fetch_blacklist_journal(self, kind):
+        with self.lock:
+            self.flush()
+            rows = self.conn.execute('''
+                SELECT address FROM blacklist_journal WHERE kind = ? ORDER BY added_at
+            ''', (kind,)).fetchall()
+            return [row[0] for row in rows]
+
+    def fetch_rugcheck_verdicts(self, chain):
+        with self.lock:
+            return self.conn.execute('''
+                SELECT address, is_good FROM rugcheck_verdicts WHERE chain = ?
+            ''', (chain,)).fetchall()
+
+    def fetch_rugcheck_verdict(self, chain, address):
+        with self.lock:
+            return self.conn.execute('''
+                SELECT is_good, details, checked_at FROM rugcheck_verdicts
+                WHERE chain = ? AND address = ?
+            ''', (chain, address)).fetchone()
+
+    def store_rugcheck_verdict(self, chain, address, is_good, details, checked_at):
+        self._enqueue('''
+            INSERT OR REPLACE INTO rugcheck_verdicts (chain, address, is_good, details, checked_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (chain, address, int(is_good), details, checked_at))
+
+    def purge_rugcheck_verdicts(self, older_than):
+        return self._write_now([('DELETE FROM rugcheck_verdicts WHERE checked_at < ?', (older_than,))])
+
+    def fetch_patterns_since(self, last_id, limit):
+        """Up to limit patterns after last_id, how many more follow them, and the last id covered.
+
+        All three come from one read transaction, so a pattern committed meanwhile (by the
+        trade thread or the writer process) is either counted here or left for the next call.
+        """
+        with self.lock:
+            self.flush()
+            self.conn.execute('BEGIN')
+            try:
+                rows = self.conn.execute('''
+                    SELECT * FROM patterns WHERE id > ? ORDER BY id LIMIT ?
+                ''', (last_id, limit)).fetchall()
+                if rows:
+                    last_id = rows[-1][0]
+                remaining, newest = self.conn.execute(
+                    'SELECT COUNT(*), MAX(id) FROM patterns WHERE id > ?', (last_id,)
+                ).fetchone()
+            finally:
+                self.conn.execute('COMMIT')
+            return rows, remaining, newest or last_id
+
+    def fetch_pattern_counts(self):
+        with self.lock:
+            self.flush()
+            return self.conn.execute('SELECT pattern_type, count FROM pattern_counts ORDER BY count DESC').fetchall()
+
+    def fetch_top_coins(self, limit):
+        with self.lock:
+            self.flush()
+            return self.conn.execute('''
+                SELECT * FROM tokens WHERE market_cap IS NOT NULL ORDER BY market_cap DESC LIMIT ?
+            ''', (limit,)).fetchall()
+
+    def record_trade_latency(self, token_address, executed_at, fetch_ms, stages, dispatch_ms, order_ms, total_ms):
+        self._enqueue('''
+            INSERT INTO trade_latency (token_address, executed_at, fetch_ms, stages, dispatch_ms, order_ms, total_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (token_address, executed_at, fetch_ms, stages, dispatch_ms, order_ms, total_ms))
+
+    def get_state(self, key, default=None):
+        with self.lock:
+            row = self.conn.execute('SELECT value FROM analytics_state WHERE key = ?', (key,)).fetchone()
+            return default if row is None else row[0]
+
+    def set_state(self, key, value):
+        self._enqueue('INSERT OR REPLACE INTO analytics_state (key, value) VALUES (?, ?)', (key, value))
 
     def fetch_all_coins(self):
-        self.cursor.execute('SELECT * FROM tokens')
-        return self.cursor.fetchall()
+        with self.lock:
+            self.flush()
+            return self.conn.execute('SELECT * FROM tokens').fetchall()
 
     def fetch_patterns(self):
-        self.cursor.execute('SELECT * FROM patterns')
-        return self.cursor.fetchall()
+        with self.lock:
+            self.flush()
+            return self.conn.execute('SELECT * FROM patterns').fetchall()
 
     def close(self):
+        self.stop_event.set()
+        if self.flusher is not None:
+            self.flusher.join()
+        self.flush()
+        if self.pending_rows:
+            self.rows_dropped += self.pending_rows
+            logger.error(f"Dropped {self.pending_rows} rows that could not be written before closing.")
         self.conn.close()
 
+class VerdictCache:
+    """Rugcheck verdicts keyed by (chain, address): a bounded in-memory LRU in front of SQLite."""
+
+    def __init__(self, db, ttl, max_size=10000, purge=True):
+        self.db = db
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if purge:
+            self.db.purge_rugcheck_verdicts(int(datetime.now().timestamp()) - self.ttl)
+
+    def get(self, chain, address):
+        key = (chain, address)
+        now = int(datetime.now().timestamp())
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if now - entry[2] < self.ttl:
+                    self.entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0], entry[1]
+                del self.entries[key]
+
+        row = self.db.fetch_rugcheck_verdict(chain, address)
+        with self.lock:
+            if row is not None and now - row[2] < self.ttl:
+                self._remember(key, (bool(row[0]), row[1], row[2]))
+                self.disk_hits += 1
+                return bool(row[0]), row[1]
+            self.misses += 1
+            return None
+
+    def put(self, chain, address, is_good, details):
+        checked_at = int(datetime.now().timestamp())
+        with self.lock:
+            self._remember((chain, address), (is_good, details, checked_at))
+        self.db.store_rugcheck_verdict(chain, address, is_good, details, checked_at)
+
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'hits': hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'size': len(self.entries)
+            }
+
+class FingerprintIndex:
+    """Last fully-scanned metrics per pair, used to skip pairs that haven't materially moved.
+
+    Besides the market metrics the fingerprint covers the inputs of the skipped checks:
+    the 24h trade count (volume spike rule) and a digest of the recent transactions
+    (bundle window), so a new buy always gets the pair checked.
+    """
+
+    FIELDS = ['price_usd', 'volume', 'liquidity', 'market_cap', 'price_change_24h', 'trades', 'recent']
+
+    def __init__(self, db, config, owns=None):
+        self.db = db
+        # Relative tolerances in percent, except price_change_24h which is in percentage points
+        self.tolerances = {
+            'price_usd': config.get('price_delta_pct', 1),
+            'volume': config.get('volume_delta_pct', 5),
+            'liquidity': config.get('liquidity_delta_pct', 5),
+            'market_cap': config.get('market_cap_delta_pct', 5),
+            'price_change_24h': config.get('price_change_delta', 5),
+            'trades': config.get('trades_delta_pct', 5)
+        }
+        # Time-dependent verdicts (pair age, Rugcheck TTL) still get refreshed
+        self.full_rescan_interval = config.get('full_rescan_interval', 900)
+        # A shard worker only loads the pairs it owns
+        self.fingerprints = {row[0]: row[1:] for row in self.db.fetch_fingerprints() if owns is None or owns(row[0])}
+
+    @staticmethod
+    def _number(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _digest(transactions):
+        """Order-independent digest of the recent transactions, keyed like BundleWindow."""
+        try:
+            keys = sorted(
+                repr(tx.get('hash') or (tx.get('timestamp', 0), tx.get('buyer_wallet'), tx.get('amount', 0)))
+                for tx in transactions
+            )
+        except (AttributeError, TypeError):
+            return None
+        return zlib.crc32('\n'.join(keys).encode('utf-8'))
+
+    def _values(self, token):
+        return tuple(self._digest(token.recent) if field == 'recent' else getattr(token, field) for field in self.FIELDS)
+
+    def _within(self, field, old, new):
+        if field not in self.tolerances:
+            return old == new
+        old_number, new_number = self._number(old), self._number(new)
+        if old_number is None or new_number is None:
+            return old == new
+        if field == 'price_change_24h':
+            return abs(new_number - old_number) <= self.tolerances[field]
+        if old_number == 0:
+            return new_number == 0
+        return abs(new_number - old_number) / abs(old_number) * 100 <= self.tolerances[field]
+
+    def is_unchanged(self, token, now):
+        fingerprint = self.fingerprints.get(token.address)
+        if fingerprint is None or now - fingerprint[-1] >= self.full_rescan_interval:
+            return False
+        return all(self._within(field, old, new) for field, old, new in zip(self.FIELDS, fingerprint, self._values(token)))
+
+    def record(self, token, now):
+        values = self._values(token)
+        self.fingerprints[token.address] = values + (now,)
+        self.db.store_fingerprint(token.address, values, now)
+
+class SnapshotStore:
+    """Append-only per-pair metric history with retention and hourly downsampling."""
+
+    def __init__(self, db, config):
+        self.db = db
+        self.min_interval = config.get('min_interval', 60)
+        self.retention = config.get('retention_days', 30) * 86400
+        self.downsample_after = config.get('downsample_after_hours', 24) * 3600
+        self.bucket_seconds = config.get('bucket_seconds', 3600)
+        self.compact_interval = config.get('compact_interval', 3600)
+        self.last_appended = {}
+        self.downsampled_until = 0
+        self.last_compacted = 0
+
+    @staticmethod
+    def _whole(value):
+        try:
+            return int(round(float(value)))
+        except (TypeError, ValueError, OverflowError):
+            return None
+
+    @staticmethod
+    def _real(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    def append(self, token, now):
+        """Record a snapshot, at most one per pair every min_interval seconds."""
+        address = token.address
+        if now - self.last_appended.get(address, 0) < self.min_interval:
+            return
+        self.last_appended[address] = now
+        self.db.append_snapshot((
+            address, now, self._real(token.price_usd),
+            self._whole(token.volume), self._whole(token.liquidity), self._whole(token.market_cap)
+        ))
+
+    def baselines(self, addresses, field, window_seconds, now):
+        """Average of field over [now - window, now) per address.
+
+        Pairs with no snapshot inside the window carry their last earlier value forward,
+        since unchanged pairs aren't re-snapshotted by every poll.
+        """
+        averages = self.db.fetch_snapshot_averages(addresses, field, now - window_seconds, now)
+        missing = [address for address in addresses if address not in averages]
+        if missing:
+            averages.update(self.db.fetch_snapshot_latest(missing, field, now - window_seconds))
+        return averages
+
+    def baseline(self, address, field, window_seconds, now):
+        return self.baselines([address], field, window_seconds, now).get(address)
+
+    def compact(self, now, force=False):
+        if not force and now - self.last_compacted < self.compact_interval:
+            return
+        self.last_compacted = now
+        cutoff = now - self.downsample_after
+        cutoff -= cutoff % self.bucket_seconds
+        if cutoff > self.downsampled_until:
+            self.db.downsample_snapshots(self.downsampled_until, cutoff, self.bucket_seconds)
+            self.downsampled_until = cutoff
+        self.db.purge_snapshots(now - self.retention)
+        # Drop throttle entries that can no longer suppress an append
+        self.last_appended = {
+            address: appended for address, appended in self.last_appended.items()
+            if now - appended < self.min_interval
+        }
+
 class Blacklist:
-    def __init__(self, config_path):
+    def __init__(self, config_path, db=None, compact_interval=300, on_add=None, path=None):
         self.config_path = config_path
+        self.db = db
+        # Coins blacklisted at runtime are written to their own file; config.yaml is never rewritten
+        self.path = path
+        # None never writes the file (shard workers); on_add is told about every new coin
+        self.compact_interval = compact_interval
+        self.on_add = on_add
         self.lock = threading.Lock()
+        self.dirty = False
+        self.last_compacted = time.monotonic()
         try:
             with open(config_path, 'r') as file:
                 config = yaml.safe_load(file)
             blacklist_config = config.get('blacklist', {})
             self.blacklisted_coins = blacklist_config.get('coins', []) or []
             self.blacklisted_devs = blacklist_config.get('devs', []) or []
-            print(f"Loaded {len(self.blacklisted_coins)} blacklisted coins and {len(self.blacklisted_devs)} blacklisted devs.")
         except FileNotFoundError:
             print(f"Error: Config file {config_path} not found.")
             self.blacklisted_coins = []
@@ -98,44 +1143,98 @@ class Blacklist:
             self.blacklisted_coins = []
             self.blacklisted_devs = []
 
+        # Lookups go through normalized sets; the lists keep the original spelling for the file
+        self.coins = {addr.lower() for addr in self.blacklisted_coins}
+        self.devs = {addr.lower() for addr in self.blacklisted_devs}
+        self.added = []
+        for address in self._load_file():
+            self._remember(address)
+        if self.db is not None:
+            for address in self.db.fetch_blacklist_journal('coin'):
+                if self._remember(address):
+                    self.dirty = True
+        print(f"Loaded {len(self.blacklisted_coins)} blacklisted coins and {len(self.blacklisted_devs)} blacklisted devs.")
+
+    def _load_file(self):
+        if not self.path or not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, 'r') as file:
+                return (yaml.safe_load(file) or {}).get('coins', []) or []
+        except (OSError, yaml.YAMLError) as e:
+            print(f"Error reading blacklist file {self.path}: {e}")
+            return []
+
+    def _remember(self, address):
+        if address.lower() in self.coins:
+            return False
+        self.coins.add(address.lower())
+        self.blacklisted_coins.append(address)
+        self.added.append(address)
+        return True
+
     def is_coin_blacklisted(self, address):
         if not address:
             return False
-        return address.lower() in [addr.lower() for addr in self.blacklisted_coins]
+        return address.lower() in self.coins
 
     def is_dev_blacklisted(self, dev_address):
         if not dev_address:
             return False
-        return dev_address.lower() in [addr.lower() for addr in self.blacklisted_devs]
+        return dev_address.lower() in self.devs
 
     def add_coin_to_blacklist(self, address, reason):
         with self.lock:
-            if address.lower() not in [addr.lower() for addr in self.blacklisted_coins]:
-                self.blacklisted_coins.append(address)
-                print(f"Added {address} to blacklist: {reason}")
-                self._update_config()
+            added = self._remember(address)
+            if added:
+                logger.info(f"Added {address} to blacklist: {reason}")
+                if self.db is not None:
+                    self.db.append_blacklist_journal('coin', address, reason)
+                self.dirty = True
             else:
-                print(f"Coin {address} already blacklisted.")
+                logger.debug(f"Coin {address} already blacklisted.")
+        if added and self.on_add is not None:
+            self.on_add(address, reason)
+        self.compact()
 
-    def _update_config(self):
-        tryirsi
-            with open(self.config_path, 'r') as file:
-                config = yaml.safe_load(file)
-            config['blacklist']['coins'] = self.blacklisted_coins
-            with open(self.config_path, 'w') as file:
-                yaml.safe_dump(config, file, default_flow_style=False)
-            print(f"Updated config.yaml with new blacklist.")
+    def merge(self, address):
+        """Take in a coin another process already blacklisted and journaled."""
+        with self.lock:
+            if self._remember(address):
+                self.dirty = True
+
+    def compact(self, force=False):
+        """Write the runtime additions to the blacklist file, at most once per compact_interval."""
+        with self.lock:
+            if not self.dirty or self.compact_interval is None or not self.path:
+                return
+            if not force and time.monotonic() - self.last_compacted < self.compact_interval:
+                return
+            self.dirty = False
+            self.last_compacted = time.monotonic()
+            coins = list(self.added)
+        self._write_file(coins)
+
+    def _write_file(self, coins):
+        try:
+            # Written aside and renamed, so a crash never leaves a truncated file
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w') as file:
+                yaml.safe_dump({'coins': coins}, file, default_flow_style=False)
+            os.replace(temp_path, self.path)
+            logger.info(f"Wrote {len(coins)} runtime blacklisted coins to {self.path}.")
         except Exception as e:
-            print(f"Error updating config.yaml: {e}")
+            logger.error(f"Error writing blacklist file {self.path}: {e}")
+            with self.lock:
+                self.dirty = True
 
 class Filters:
     @staticmethod
     def apply_filters(token, filters):
         try:
-            market_cap = token.get('market_cap', 0)
-            volume = token.get('volume', 0)
-            liquidity = token.get('liquidity', 0)
-            pair_created_at = token.get('pair_created_at', 0)
+            market_cap = token.market_cap
+            volume = token.volume
+            liquidity = token.liquidity
             
             if not all(key in filters for key in ['min_market_cap', 'max_daily_volume', 'min_liquidity', 'max_age_hours']):
                 raise ValueError("Missing required filter keys in config.")
@@ -154,7 +1253,7 @@ class Filters:
     @staticmethod
     def detect_pump(token, filters):
         try:
-            price_change = token.get('price_change_24h', 0)
+            price_change = token.price_change_24h
             return price_change > filters['max_price_change'], f"Price change: {price_change}%"
         except KeyError:
             return False, "Missing max_price_change in filters"
@@ -162,23 +1261,37 @@ class Filters:
     @staticmethod
     def detect_rug(token, filters):
         try:
-            price_change = token.get('price_change_24h', 0)
+            price_change = token.price_change_24h
             return price_change < filters['min_price_drop'], f"Price drop: {price_change}%"
         except KeyError:
             return False, "Missing min_price_drop in filters"
 
     @staticmethod
-    def is_new_pair(token, filters):
+    def is_new_pair(token, filters, now=None):
         try:
-            pair_created_at = token.get('pair_created_at', 0) / 1000
-            current_time = datetime.now().timestamp()
+            pair_created_at = token.pair_created_at / 1000
+            current_time = datetime.now().timestamp() if now is None else now
             max_age_seconds = filters['max_age_hours'] * 3600
             return pair_created_at > current_time - max_age_seconds, f"Pair age: {(current_time - pair_created_at) / 3600:.2f} hours"
         except KeyError:
             return False, "Missing max_age_hours in filters"
 
+    @staticmethod
+    def determine_status(token, filters, now=None):
+        is_pump, pump_details = Filters.detect_pump(token, filters)
+        if is_pump:
+            return 'pumped', pump_details
+        is_rug, rug_details = Filters.detect_rug(token, filters)
+        if is_rug:
+            return 'rugged', rug_details
+        is_new, new_details = Filters.is_new_pair(token, filters, now)
+        if is_new:
+            return 'new_pair', new_details
+        return 'stable', "No significant patterns detected"
+
 class FakeVolumeDetector:
-    def __init__(self, config):
+    def __init__(self, config, http=None):
+        self.http = http or HttpClient(config.get('http', {}))
         self.config = config.get('fake_volume', {})
         self.pocket_universe_api = config.get('dexscreener', {}).get('pocket_universe_api')
         self.pocket_universe_enabled = self.config.get('pocket_universe_enabled', False)
@@ -187,21 +1300,36 @@ class FakeVolumeDetector:
         self.min_trades_for_spike = self.config.get('min_trades_for_spike', 10)
 
     def detect_fake_volume(self, token):
+        result = self.check_heuristics(token)
+        if result is not None:
+            return result
+        return self.check_remote(token)
+
+    def check_heuristics(self, token):
+        """Local checks only. Returns a verdict, or None when the remote check decides."""
         try:
-            volume = token.get('volume', 0)
-            liquidity = token.get('liquidity', 0)
-            trades = token.get('txns', {}).get('h24', {}).get('buys', 0) + token.get('txns', {}).get('h24', {}).get('sells', 0)
-            address = token.get('address')
+            volume = token.volume
+            liquidity = token.liquidity
+            trades = self._trades(token)
 
             if liquidity > 0 and volume / liquidity > self.volume_liquidity_ratio:
                 return True, f"High volume-to-liquidity ratio: {volume/liquidity:.2f}x"
 
-            historical_volume = token.get('volume_h6', 0)
+            historical_volume = token.volume_h6
             if historical_volume > 0 and volume / historical_volume * 100 > self.volume_spike_threshold and trades >= self.min_trades_for_spike:
                 return True, f"Volume spike: {volume/historical_volume*100:.2f}% with {trades} trades"
 
+            return None
+        except Exception as e:
+            return False, f"Error detecting fake volume: {str(e)}"
+
+    def check_remote(self, token):
+        """Pocket Universe verdict; (None, reason) when the API couldn't be asked this time."""
+        try:
             if self.pocket_universe_enabled:
-                is_fake = self._check_pocket_universe(address, volume, trades)
+                is_fake = self._check_pocket_universe(token.address, token.volume, self._trades(token))
+                if is_fake is None:
+                    return None, "Pocket Universe API unavailable"
                 if is_fake:
                     return True, "Pocket Universe API flagged as fake volume"
 
@@ -209,11 +1337,17 @@ class FakeVolumeDetector:
         except Exception as e:
             return False, f"Error detecting fake volume: {str(e)}"
 
+    @staticmethod
+    def _trades(token):
+        if token.trades is None:
+            raise ValueError("Malformed 24h transaction counts")
+        return token.trades
+
     def _check_pocket_universe(self, address, volume, trades):
         try:
             if not self.pocket_universe_api:
                 return False
-            response = requests.post(self.pocket_universe_api, json={
+            response = self.http.post(self.pocket_universe_api, json={
                 'address': address,
                 'volume_24h': volume,
                 'trades_24h': trades
@@ -222,84 +1356,452 @@ class FakeVolumeDetector:
             data = response.json()
             return data.get('is_fake_volume', False)
         except requests.RequestException as e:
-            print(f"Pocket Universe API error: {e}")
-            return False
+            logger.warning(f"Pocket Universe API error: {e}")
+            return None if is_unavailable(e) else False
 
-class Rugcheck:
-    def __init__(self, config):
-        self.api_url = config.get('rugcheck', {}).get('api_url')
-        self.api_key = config.get('rugcheck', {}).get('api_key')
-        self.chain = config.get('rugcheck', {}).get('chain', 'solana')
-        self.bundle_config = config.get('bundle', {})
-        self.max_wallets = self.bundle_config.get('max_wallets', 5)
-        self.min_percentage = self.bundle_config.get('min_percentage', 2)
-        self.time_window_seconds = self.bundle_config.get('time_window_seconds', 60)
+class BatchEvaluator:
+    """Runs the local checks for a whole scan as NumPy columns.
+
+    Verdicts and reason strings are identical to Filters, FakeVolumeDetector.check_heuristics
+    and DexscreenerBot.determine_status. Rows whose values the float columns can't hold
+    exactly (None, strings, ints beyond 2**53) are handed to those scalar functions instead.
+    """
+
+    FILTER_KEYS = ['min_market_cap', 'max_daily_volume', 'min_liquidity', 'max_age_hours']
+    FILTER_REASONS = ["Market cap too low", "Volume too high", "Liquidity too low"]
+
+    def __init__(self, filters, fake_volume_detector, determine_status):
+        self.filters = filters
+        self.detector = fake_volume_detector
+        self.determine_status = determine_status
+        # Validated once per evaluator instead of once per token
+        self.filters_complete = all(key in filters for key in self.FILTER_KEYS)
+        self.filters_numeric = self.filters_complete and all(
+            self._is_exact(filters[key]) for key in ['min_market_cap', 'max_daily_volume', 'min_liquidity']
+        )
+        self.status_numeric = all(
+            self._is_exact(filters[key]) for key in ['max_price_change', 'min_price_drop', 'max_age_hours'] if key in filters
+        )
+        self.detector_numeric = all(self._is_exact(value) for value in [
+            fake_volume_detector.volume_liquidity_ratio,
+            fake_volume_detector.volume_spike_threshold,
+            fake_volume_detector.min_trades_for_spike
+        ])
+
+    @staticmethod
+    def _is_exact(value):
+        value_type = type(value)
+        return value_type is float or (value_type in (int, bool) and -2 ** 53 <= value <= 2 ** 53)
+
+    def _column(self, tokens, key, exact):
+        values = np.zeros(len(tokens))
+        for i, value in enumerate(map(operator.attrgetter(key), tokens)):
+            if self._is_exact(value):
+                values[i] = value
+            else:
+                exact[i] = False
+        return values
+
+    def _trades_column(self, tokens, exact):
+        values = np.zeros(len(tokens))
+        for i, token in enumerate(tokens):
+            value = token.trades
+            if self._is_exact(value):
+                values[i] = value
+            else:
+                exact[i] = False
+        return values
+
+    def columns(self, tokens):
+        """The float columns and exactness masks evaluate() reads; they don't depend on the thresholds."""
+        n = len(tokens)
+        market_exact = np.ones(n, dtype=bool)
+        market_cap = self._column(tokens, 'market_cap', market_exact)
+        volume = self._column(tokens, 'volume', market_exact)
+        liquidity = self._column(tokens, 'liquidity', market_exact)
+
+        fake_exact = market_exact.copy()
+        volume_h6 = self._column(tokens, 'volume_h6', fake_exact)
+        trades = self._trades_column(tokens, fake_exact)
+
+        status_exact = np.ones(n, dtype=bool)
+        price_change = self._column(tokens, 'price_change_24h', status_exact)
+        pair_created_at = self._column(tokens, 'pair_created_at', status_exact)
+        return {
+            'market_cap': market_cap, 'volume': volume, 'liquidity': liquidity, 'market_exact': market_exact,
+            'volume_h6': volume_h6, 'trades': trades, 'fake_exact': fake_exact,
+            'price_change_24h': price_change, 'pair_created_at': pair_created_at, 'status_exact': status_exact
+        }
+
+    def evaluate(self, tokens, now=None, columns=None):
+        """Verdicts for a whole scan; pass columns to reuse ones built earlier for the same tokens."""
+        if now is None:
+            now = datetime.now().timestamp()
+        n = len(tokens)
+        filters = self.filters
+        detector = self.detector
+
+        columns = self.columns(tokens) if columns is None else columns
+        market_cap, volume, liquidity = columns['market_cap'], columns['volume'], columns['liquidity']
+        volume_h6, trades = columns['volume_h6'], columns['trades']
+        price_change, pair_created_at = columns['price_change_24h'], columns['pair_created_at']
+        market_exact, fake_exact, status_exact = columns['market_exact'], columns['fake_exact'], columns['status_exact']
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Fake volume heuristics; flagged rows get their reason from the scalar check
+            if self.detector_numeric:
+                ratio_flag = (liquidity > 0) & (volume / liquidity > detector.volume_liquidity_ratio)
+                spike_flag = (volume_h6 > 0) & (volume / volume_h6 * 100 > detector.volume_spike_threshold) \
+                    & (trades >= detector.min_trades_for_spike)
+                fake_scalar = (ratio_flag | spike_flag) | ~fake_exact
+            else:
+                fake_scalar = np.ones(n, dtype=bool)
+
+        # Filters: index into FILTER_REASONS, -1 for a pass
+        filter_code = np.full(n, -1, dtype=np.int8)
+        if self.filters_numeric:
+            filter_code[liquidity < filters['min_liquidity']] = 2
+            filter_code[volume > filters['max_daily_volume']] = 1
+            filter_code[market_cap < filters['min_market_cap']] = 0
+            filter_scalar = ~market_exact
+        else:
+            filter_scalar = np.full(n, self.filters_complete, dtype=bool)
+
+        # Status: 0 pumped, 1 rugged, 2 new_pair, 3 stable, in determine_status order
+        status_code = np.full(n, 3, dtype=np.int8)
+        if self.status_numeric:
+            if 'max_age_hours' in filters:
+                status_code[pair_created_at / 1000 > now - filters['max_age_hours'] * 3600] = 2
+            if 'min_price_drop' in filters:
+                status_code[price_change < filters['min_price_drop']] = 1
+            if 'max_price_change' in filters:
+                status_code[price_change > filters['max_price_change']] = 0
+            status_scalar = ~status_exact
+        else:
+            status_scalar = np.ones(n, dtype=bool)
+
+        return BatchVerdicts(self, tokens, now, fake_scalar, filter_code, filter_scalar, status_code, status_scalar)
+
+class BatchVerdicts:
+    """Per-row access to the verdicts computed by BatchEvaluator.evaluate."""
+
+    STATUSES = ['pumped', 'rugged', 'new_pair', 'stable']
+
+    def __init__(self, evaluator, tokens, now, fake_scalar, filter_code, filter_scalar, status_code, status_scalar):
+        self.evaluator = evaluator
+        self.tokens = tokens
+        self.now = now
+        self.fake_scalar = fake_scalar
+        self.filter_code = filter_code
+        self.filter_scalar = filter_scalar
+        self.status_code = status_code
+        self.status_scalar = status_scalar
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def fake_volume(self, i):
+        """Local fake-volume verdict, or None when only the remote check can decide."""
+        if self.fake_scalar[i]:
+            return self.evaluator.detector.check_heuristics(self.tokens[i])
+        return None
+
+    def passed_filters(self):
+        """Indexes of the rows that pass the filters; only rows needing the scalar check are visited."""
+        if not self.evaluator.filters_complete:
+            return np.zeros(0, dtype=np.intp)
+        passed = (self.filter_code < 0) & ~self.filter_scalar
+        for i in np.flatnonzero(self.filter_scalar):
+            passed[i] = self.filters(i)[0]
+        return np.flatnonzero(passed)
+
+    def filters(self, i):
+        evaluator = self.evaluator
+        if not evaluator.filters_complete:
+            return False, "Filter error: Missing required filter keys in config."
+        if self.filter_scalar[i]:
+            return Filters.apply_filters(self.tokens[i], evaluator.filters)
+        code = self.filter_code[i]
+        if code < 0:
+            return True, "Passed all filters"
+        return False, BatchEvaluator.FILTER_REASONS[code]
+
+    def status(self, i):
+        token = self.tokens[i]
+        filters = self.evaluator.filters
+        if self.status_scalar[i]:
+            return self.evaluator.determine_status(token, self.now)
+        code = self.status_code[i]
+        if code == 0:
+            return 'pumped', Filters.detect_pump(token, filters)[1]
+        if code == 1:
+            return 'rugged', Filters.detect_rug(token, filters)[1]
+        if code == 2:
+            return 'new_pair', Filters.is_new_pair(token, filters, self.now)[1]
+        return 'stable', "No significant patterns detected"
+
+class BundleWindow:
+    """Running per-wallet buy totals for one pair over the last window_seconds.
+
+    Buys enter once, keyed by transaction, and leave when they age out, so each scan only
+    touches new and expiring transactions; a buy that shows up late is still counted.
+    `significant` counts the wallets currently at or above min_percentage of supply and
+    is updated as totals cross the threshold.
+    """
+
+    def __init__(self, window_seconds, min_percentage, max_transactions=10000):
+        self.window_seconds = window_seconds
+        self.min_percentage = min_percentage
+        self.max_transactions = max_transactions
+        self.buys = deque()
+        self.totals = {}
+        self.counts = {}
+        self.significant = 0
+        self.total_supply = None
+        # Keys of the buys in self.buys, so a transaction listed again is never counted twice
+        self.keys = set()
+
+    def _is_significant(self, amount):
+        return (amount / self.total_supply * 100) >= self.min_percentage
+
+    def _adjust(self, wallet, delta, count_delta):
+        before = self.totals.get(wallet, 0)
+        after = before + delta
+        was_significant = wallet in self.totals and self._is_significant(before)
+        count = self.counts.get(wallet, 0) + count_delta
+        if count:
+            self.totals[wallet] = after
+            self.counts[wallet] = count
+            is_significant = self._is_significant(after)
+        else:
+            self.totals.pop(wallet, None)
+            self.counts.pop(wallet, None)
+            is_significant = False
+        self.significant += int(is_significant) - int(was_significant)
+
+    def set_total_supply(self, total_supply):
+        if total_supply != self.total_supply:
+            self.total_supply = total_supply
+            self.significant = sum(1 for amount in self.totals.values() if self._is_significant(amount))
+
+    def add(self, transactions, now):
+        for tx in transactions:
+            timestamp = tx.get('timestamp', 0)
+            key = tx.get('hash') or (timestamp, tx.get('buyer_wallet'), tx.get('amount', 0))
+            tx_time = timestamp / 1000
+            if key in self.keys or now - tx_time > self.window_seconds:
+                continue
+            wallet = tx.get('buyer_wallet')
+            amount = tx.get('amount', 0)
+            if wallet and amount:
+                self._insert((tx_time, key, wallet, amount))
+                self._adjust(wallet, amount, 1)
+                if len(self.buys) > self.max_transactions:
+                    self._evict_oldest()
+
+    def _insert(self, buy):
+        # Buys stay in timestamp order for expiry; late ones are usually recent, so search from the right
+        self.keys.add(buy[1])
+        position = len(self.buys)
+        while position and self.buys[position - 1][0] > buy[0]:
+            position -= 1
+        if position == len(self.buys):
+            self.buys.append(buy)
+        else:
+            self.buys.insert(position, buy)
+
+    def _evict_oldest(self):
+        _, key, wallet, amount = self.buys.popleft()
+        self.keys.discard(key)
+        self._adjust(wallet, -amount, -1)
+
+    def expire(self, now):
+        while self.buys and now - self.buys[0][0] > self.window_seconds:
+            self._evict_oldest()
+
+class Rugcheck:
+    def __init__(self, config, http=None, cache=None):
+        self.http = http or HttpClient(config.get('http', {}))
+        self.cache = cache
+        self.api_url = config.get('rugcheck', {}).get('api_url')
+        self.api_key = config.get('rugcheck', {}).get('api_key')
+        self.chain = config.get('rugcheck', {}).get('chain', 'solana')
+        self.bundle_config = config.get('bundle', {})
+        self.max_wallets = self.bundle_config.get('max_wallets', 5)
+        self.min_percentage = self.bundle_config.get('min_percentage', 2)
+        self.time_window_seconds = self.bundle_config.get('time_window_seconds', 60)
+        self.max_tracked_pairs = self.bundle_config.get('max_tracked_pairs', 10000)
+        self.max_window_transactions = self.bundle_config.get('max_window_transactions', 10000)
+        self.bundle_windows = OrderedDict()
 
     def check_token(self, address):
+        if self.cache is not None:
+            cached = self.cache.get(self.chain, address)
+            if cached is not None:
+                return cached
         try:
             if not self.api_url or not self.api_key:
                 raise ValueError("Rugcheck API URL or key missing in config.")
             headers = {"X-API-KEY": self.api_key}
             url = f"{self.api_url}/tokens/scan/{self.chain}/{address}"
-            response = requests.get(url, headers=headers)
+            response = self.http.get(url, headers=headers)
             response.raise_for_status()
             data = response.json()
             is_good = data.get('status') == "Good"
             details = data.get('details', 'No details provided')
+            # Only real API answers are cached; errors are retried next cycle
+            if self.cache is not None:
+                self.cache.put(self.chain, address, is_good, details)
             return is_good, details
         except requests.RequestException as e:
-            print(f"Rugcheck API error for {address}: {e}")
+            logger.warning(f"Rugcheck API error for {address}: {e}")
+            if is_unavailable(e):
+                # No verdict: the token is held back and asked about again next cycle
+                return None, f"API unavailable: {str(e)}"
             return False, f"API error: {str(e)}"
         except ValueError as e:
-            print(f"Rugcheck config error: {e}")
+            logger.error(f"Rugcheck config error: {e}")
             return False, str(e)
 
-    def detect_bundle(self, token):
+    def detect_bundle(self, token, now=None):
         try:
-            address = token.get('address')
-            transactions = token.get('txns', {}).get('recent', [])
-            if not transactions:
+            address = token.address
+            transactions = token.recent
+            window = self.bundle_windows.get(address)
+            if not transactions and window is None:
                 return False, "No transaction data available"
 
-            wallet_holdings = {}
-            current_time = datetime.now().timestamp()
-            for tx in transactions:
-                tx_time = tx.get('timestamp', 0) / 1000
-                if current_time - tx_time > self.time_window_seconds:
-                    continue
-                wallet = tx.get('buyer_wallet')
-                amount = tx.get('amount', 0)
-                if wallet and amount:
-                    wallet_holdings[wallet] = wallet_holdings.get(wallet, 0) + amount
-
-            total_supply = token.get('total_supply', 1)
-            significant_wallets = [
-                wallet for wallet, amount in wallet_holdings.items()
-                if (amount / total_supply * 100) >= self.min_percentage
-            ]
-            if len(significant_wallets) >= self.max_wallets:
-                return True, f"Bundle detected: {len(significant_wallets)} wallets hold >= {self.min_percentage}% each"
+            if window is None:
+                window = BundleWindow(self.time_window_seconds, self.min_percentage, self.max_window_transactions)
+                self.bundle_windows[address] = window
+                # Least recently scanned pairs give up their window first
+                while len(self.bundle_windows) > self.max_tracked_pairs:
+                    self.bundle_windows.popitem(last=False)
+            else:
+                self.bundle_windows.move_to_end(address)
+
+            current_time = datetime.now().timestamp() if now is None else now
+            window.set_total_supply(token.total_supply)
+            window.add(transactions, current_time)
+            window.expire(current_time)
+
+            if window.significant >= self.max_wallets:
+                return True, f"Bundle detected: {window.significant} wallets hold >= {self.min_percentage}% each"
             return False, "No bundle detected"
         except Exception as e:
-            print(f"Bundle detection error for {address}: {e}")
+            logger.warning(f"Bundle detection error for {address}: {e}")
             return False, f"Error: {str(e)}"
 
 class TelegramNotifier:
-    def __init__(self, bot_token, chat_id):
+    """Sends notifications from a background thread so callers only pay for an enqueue.
+
+    Queued messages are merged into digests (trade confirmations first), each chat is
+    held to one message per min_interval, and 429 responses are retried after the
+    retry_after Telegram asks for.
+    """
+
+    TRADE = 0
+    INFO = 1
+    MAX_MESSAGE_LENGTH = 4096
+
+    def __init__(self, bot_token, chat_id, http=None, config=None, api_url='https://api.telegram.org'):
+        config = config or {}
+        self.http = http or HttpClient()
         self.bot_token = bot_token
         self.chat_id = chat_id
-        self.base_url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
+        self.base_url = f"{api_url.rstrip('/')}/bot{self.bot_token}/sendMessage"
+        self.coalesce_seconds = config.get('coalesce_ms', 2000) / 1000
+        self.max_batch = config.get('max_batch', 20)
+        self.min_interval = config.get('min_interval', 1.0)
+        self.max_retries = config.get('max_retries', 3)
+        self.trade_enqueue_timeout = config.get('trade_enqueue_timeout', 1.0)
+        self.queue = queue.PriorityQueue(maxsize=config.get('queue_size', 1000))
+        self.sequence = itertools.count()
+        self.last_sent = {}
+        self.dropped = 0
+        self.stop_event = threading.Event()
+        self.worker = threading.Thread(target=self._dispatch, name='telegram-dispatcher', daemon=True)
+        self.worker.start()
 
-    def send_notification(self, message):
+    def send_notification(self, message, priority=INFO):
         try:
-            response = requests.post(self.base_url, json={
-                'chat_id': self.chat_id,
-                'text': message
-            })
-            response.raise_for_status()
-            print(f"Telegram notification sent: {message}")
-        except requests.RequestException as e:
-            print(f"Error sending Telegram notification: {e}")
+            if priority == self.TRADE:
+                self.queue.put((priority, next(self.sequence), message), timeout=self.trade_enqueue_timeout)
+            else:
+                self.queue.put_nowait((priority, next(self.sequence), message))
+        except queue.Full:
+            self.dropped += 1
+
+    def _dispatch(self):
+        while not (self.stop_event.is_set() and self.queue.empty()):
+            try:
+                first = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            batch = [first]
+            # Trade confirmations go out with whatever is already queued; alerts wait briefly for company
+            deadline = time.monotonic() + (0 if first[0] == self.TRADE or self.stop_event.is_set() else self.coalesce_seconds)
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            batch.sort()
+            for digest in self._digests(batch):
+                self._send(digest)
+
+    def _digests(self, batch):
+        digest = ''
+        priority = None
+        for item_priority, _, message in batch:
+            message = message[:self.MAX_MESSAGE_LENGTH]
+            if digest and (item_priority != priority or len(digest) + 2 + len(message) > self.MAX_MESSAGE_LENGTH):
+                yield digest
+                digest = ''
+            digest = f"{digest}\n\n{message}" if digest else message
+            priority = item_priority
+        if digest:
+            yield digest
+
+    def _send(self, message):
+        wait = self.last_sent.get(self.chat_id, 0) + self.min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        for _ in range(self.max_retries + 1):
+            try:
+                response = self.http.post(self.base_url, json={
+                    'chat_id': self.chat_id,
+                    'text': message
+                })
+                self.last_sent[self.chat_id] = time.monotonic()
+                if response.status_code == 429:
+                    time.sleep(self._retry_after(response))
+                    continue
+                response.raise_for_status()
+                logger.info(f"Telegram notification sent: {message}")
+                return
+            except requests.RequestException as e:
+                logger.warning(f"Error sending Telegram notification: {e}")
+                return
+        logger.warning(f"Error sending Telegram notification: still rate limited after {self.max_retries} retries")
+
+    @staticmethod
+    def _retry_after(response):
+        try:
+            return float(response.json().get('parameters', {}).get('retry_after'))
+        except (TypeError, ValueError, AttributeError):
+            pass
+        try:
+            return float(response.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            return 1.0
+
+    def close(self, timeout=10):
+        """Stop accepting work and give queued messages up to timeout seconds to go out."""
+        self.stop_event.set()
+        self.worker.join(timeout)
 
 class ToxiSolTrader:
     def __init__(self, bot_username, wallet_address, wallet_private_key):
@@ -312,15 +1814,687 @@ class ToxiSolTrader:
         try:
             # Simulate sending a command to ToxiSol bot (e.g., /buy or /sell)
             command = f"{self.bot_username} /{action.lower()} {token_address} {amount} {self.wallet_address}"
-            print(f"Simulating ToxiSol trade: {command}")
+            logger.info(f"Simulating ToxiSol trade: {command}")
             # In a real implementation, send this command via Telegram API or ToxiSol's API
             # Requires ToxiSol API documentation for actual integration
             return True, f"{action.capitalize()} executed for {token_address} ({amount} SOL)"
         except Exception as e:
             return False, f"Error executing {action} on ToxiSol: {str(e)}"
 
+class StreamingPairParser:
+    """Incrementally yields the items of one top-level JSON array from a byte stream.
+
+    Only the current item and the unparsed tail of the last chunk are held in memory,
+    so a large DEXScreener response never has to be materialized as a whole.
+    """
+
+    WHITESPACE = ' \t\r\n'
+
+    def __init__(self, key='pairs'):
+        self.key = key
+        self.decoder = json.JSONDecoder()
+
+    def iter_items(self, chunks):
+        chunks = iter(chunks)
+        text_decoder = codecs.getincrementaldecoder('utf-8')()
+        buffer = ''
+        position = 0
+        eof = False
+
+        def fill():
+            nonlocal buffer, position, eof
+            for chunk in chunks:
+                if chunk:
+                    buffer = buffer[position:] + text_decoder.decode(chunk)
+                    position = 0
+                    return True
+            buffer = buffer[position:] + text_decoder.decode(b'', final=True)
+            position = 0
+            eof = True
+            return False
+
+        def skip(separators=''):
+            nonlocal position
+            while True:
+                while position < len(buffer) and buffer[position] in self.WHITESPACE + separators:
+                    position += 1
+                if position < len(buffer) or eof:
+                    return
+                fill()
+
+        def decode_value():
+            nonlocal position
+            while True:
+                try:
+                    value, end = self.decoder.raw_decode(buffer, position)
+                    # A number may continue in the next chunk ("12." + "5"), so a value only counts
+                    # once it is closed by its own quote or bracket, by a delimiter, or by EOF
+                    if eof or buffer[end - 1] in '"]}' or (end < len(buffer) and buffer[end] in self.WHITESPACE + ',:]}'):
+                        position = end
+                        return value
+                except json.JSONDecodeError:
+                    if eof:
+                        raise ValueError(f"Malformed JSON near offset {position}")
+                fill()
+
+        def expect(char):
+            nonlocal position
+            skip()
+            if position >= len(buffer) or buffer[position] != char:
+                raise ValueError(f"Expected '{char}' in JSON stream")
+            position += 1
+
+        expect('{')
+        while True:
+            skip(',')
+            if position >= len(buffer):
+                raise ValueError("Unexpected end of JSON stream")
+            if buffer[position] == '}':
+                return
+            key = decode_value()
+            expect(':')
+            skip()
+            if key == self.key and position < len(buffer) and buffer[position] == '[':
+                position += 1
+                while True:
+                    skip(',')
+                    if position >= len(buffer):
+                        raise ValueError("Unexpected end of JSON stream")
+                    if buffer[position] == ']':
+                        position += 1
+                        break
+                    yield decode_value()
+            else:
+                decode_value()
+
+class LatencyTracker:
+    """Signal-to-order latency per trade, kept as a rolling window and in the trade_latency table.
+
+    A trace carries monotonic timestamps: fetch_started (request issued), received (first
+    pair of the chunk arrived), stages (seconds per pipeline stage on the fast lane),
+    qualified and dispatched; the order time is added when the trade returns.
+    """
+
+    def __init__(self, db, window=1000):
+        self.db = db
+        self.totals = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, address, trace, ordered):
+        fetch_ms = (trace['received'] - trace['fetch_started']) * 1000
+        dispatch_ms = (trace['dispatched'] - trace['qualified']) * 1000
+        order_ms = (ordered - trace['dispatched']) * 1000
+        total_ms = (ordered - trace['received']) * 1000
+        stages = {name: round(seconds * 1000, 3) for name, seconds in trace['stages'].items()}
+        with self.lock:
+            self.totals.append(total_ms)
+        self.db.record_trade_latency(
+            address, int(datetime.now().timestamp()), fetch_ms, json.dumps(stages), dispatch_ms, order_ms, total_ms
+        )
+        return total_ms
+
+    def summary(self):
+        with self.lock:
+            totals = np.array(self.totals)
+        if not len(totals):
+            return None
+        return {
+            'count': len(totals),
+            'p50': float(np.percentile(totals, 50)),
+            'p99': float(np.percentile(totals, 99)),
+            'max': float(totals.max())
+        }
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class Poller:
+    """Fetches every configured DEXScreener endpoint concurrently under one rate limit.
+
+    Endpoints answer conditional requests with their last ETag/Last-Modified, so an
+    unchanged list costs a 304 and no parsing. Pairs are streamed into a bounded queue
+    and de-duplicated by pair address across endpoints.
+    """
+
+    PAIRS_PER_REQUEST = 30
+
+    def __init__(self, http, endpoints, rate_limiter, buffer_size=2000, max_workers=4, pairs_url=None):
+        self.http = http
+        self.endpoints = endpoints
+        self.pairs_url = pairs_url
+        self.rate_limiter = rate_limiter
+        self.buffer_size = buffer_size
+        self.executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(endpoints))))
+        self.validators = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+        self.errors = 0
+
+    def _fetch(self, url, emit):
+        self.rate_limiter.acquire()
+        with self.lock:
+            validators = self.validators.get(url)
+        outcome, validators = self.fetch(url, emit, validators)
+        self.record(url, outcome, validators)
+
+    def fetch(self, url, emit, validators=None):
+        """One conditional GET whose pairs are parsed into emit, without the rate limit.
+
+        Returns the outcome ('ok', 'not_modified', 'stopped' or 'error') and, once the whole
+        body has been consumed, the response's (ETag, Last-Modified).
+        """
+        headers = {}
+        etag, last_modified = validators or (None, None)
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        try:
+            with self.http.get(url, headers=headers, stream=True) as response:
+                if response.status_code == 304:
+                    return 'not_modified', validators
+                response.raise_for_status()
+                for pair in StreamingPairParser().iter_items(response.iter_content(chunk_size=65536)):
+                    if not emit(pair):
+                        return 'stopped', None
+                return 'ok', (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        except requests.RequestException as e:
+            logger.warning(f"Error fetching data from {url}: {e}")
+        except ValueError as e:
+            logger.warning(f"Error parsing data from {url}: {e}")
+        return 'error', None
+
+    def record(self, url, outcome, validators):
+        """Count a fetch (made here or by a shard worker) and keep its validators."""
+        with self.lock:
+            self.requests += 1
+            if outcome == 'not_modified':
+                self.not_modified += 1
+            elif outcome == 'error':
+                self.errors += 1
+            # Validators are only kept for the configured lists; per-address lookups change URL every time
+            elif outcome == 'ok' and url in self.endpoints:
+                self.validators[url] = validators
+
+    def stream(self, urls=None):
+        """Yield de-duplicated pairs from all endpoints (or the given URLs) as they arrive."""
+        urls = self.endpoints if urls is None else urls
+        pairs = queue.Queue(maxsize=self.buffer_size)
+        stop = threading.Event()
+        done = object()
+
+        def offer(item):
+            while not stop.is_set():
+                try:
+                    pairs.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def fetch(url):
+            try:
+                self._fetch(url, offer)
+            finally:
+                offer(done)
+
+        for url in urls:
+            self.executor.submit(fetch, url)
+
+        seen = set()
+        remaining = len(urls)
+        try:
+            while remaining:
+                pair = pairs.get()
+                if pair is done:
+                    remaining -= 1
+                    continue
+                address = pair.get('pairAddress')
+                if address is not None:
+                    if address in seen:
+                        continue
+                    seen.add(address)
+                yield pair
+        finally:
+            stop.set()
+
+    def poll(self):
+        return list(self.stream())
+
+    def stream_pairs(self, addresses):
+        """Yield the current data for specific pairs, batched into as few requests as the API allows."""
+        urls = [
+            f"{self.pairs_url.rstrip('/')}/{','.join(addresses[i:i + self.PAIRS_PER_REQUEST])}"
+            for i in range(0, len(addresses), self.PAIRS_PER_REQUEST)
+        ]
+        return self.stream(urls)
+
+    def stats(self):
+        with self.lock:
+            return {'requests': self.requests, 'not_modified': self.not_modified, 'errors': self.errors}
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+class RescanScheduler:
+    """Per-pair next-check times on a heap, with the interval chosen by the pair's status.
+
+    Rescheduling pushes a new entry and leaves the old one in place; stale entries are
+    recognised on pop by comparing against self.due and skipped.
+    """
+
+    DEFAULT_INTERVALS = {
+        'new_pair': 5,
+        'pumped': 5,
+        'rugged': 3600,
+        'stable': 900,
+        'rejected': 300,
+        'missing': 3600
+    }
+
+    def __init__(self, intervals=None, max_due=300):
+        self.intervals = dict(self.DEFAULT_INTERVALS)
+        self.intervals.update(intervals or {})
+        self.max_due = max_due
+        self.heap = []
+        self.due = {}
+        self.status = {}
+
+    def __len__(self):
+        return len(self.due)
+
+    def schedule(self, address, status, now):
+        if status is not None:
+            self.status[address] = status
+        status = self.status.get(address, 'rejected')
+        due = now + self.intervals.get(status, self.intervals['rejected'])
+        self.due[address] = due
+        heapq.heappush(self.heap, (due, address))
+        if len(self.heap) > 2 * len(self.due) + 1024:
+            self._compact()
+
+    def forget(self, address):
+        self.due.pop(address, None)
+        self.status.pop(address, None)
+
+    def pop_due(self, now):
+        """Up to max_due addresses whose check is due, most overdue first."""
+        addresses = []
+        while self.heap and len(addresses) < self.max_due and self.heap[0][0] <= now:
+            due, address = heapq.heappop(self.heap)
+            if self.due.get(address) == due:
+                del self.due[address]
+                addresses.append(address)
+        return addresses
+
+    def next_due(self):
+        while self.heap and self.due.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def _compact(self):
+        self.heap = [(due, address) for address, due in self.due.items()]
+        heapq.heapify(self.heap)
+
+class Stage:
+    """One rejection check in the scan pipeline.
+
+    check(batch, rows) gets (index, token_data) rows and returns, per row, None to pass
+    the token on, DEFER to hold it back this cycle without consequences (the check
+    couldn't decide), or the rejection details; reject(row, details) applies the consequences.
+    Stages in the same group have the same kind of consequence and may swap places.
+    """
+
+    DEFER = object()
+
+    def __init__(self, name, cost, check, reject, remote=False, group=0):
+        self.name = name
+        self.cost = cost
+        self.check = check
+        self.reject = reject
+        self.remote = remote
+        self.group = group
+        self.checked = 0
+        self.rejected = 0
+        self.deferred = 0
+        self.seconds = 0.0
+
+    @property
+    def rejection_rate(self):
+        # Laplace-smoothed so an unseen stage neither dominates nor starves
+        return (self.rejected + 1) / (self.checked + 2)
+
+    @property
+    def rank(self):
+        return self.cost / self.rejection_rate
+
+class Pipeline:
+    """Runs stages local-first; within a tier groups run in order, each ordered by cost per rejection.
+
+    Every token that passes all stages passes regardless of order. Reordering stays inside
+    a group, so it only changes how much work a rejected token costs, never whether a
+    rejected token ends up blacklisted.
+    """
+
+    def __init__(self, stages, guard=None, adaptive=True, metrics=None):
+        self.stages = stages
+        self.guard = guard
+        self.adaptive = adaptive
+        self.metrics = metrics
+
+    def ordered(self):
+        local = [stage for stage in self.stages if not stage.remote]
+        remote = [stage for stage in self.stages if stage.remote]
+        # Stable sorts: without adaptive ordering a group keeps its declared order
+        key = (lambda stage: (stage.group, stage.rank)) if self.adaptive else (lambda stage: stage.group)
+        local.sort(key=key)
+        remote.sort(key=key)
+        return local + remote
+
+    def run(self, batch, rows, remote=None, timings=None, deferred=None):
+        """Run every stage, or only the local (remote=False) or remote (remote=True) tier.
+
+        timings, when given, receives the seconds each stage spent on these rows;
+        deferred, when given, receives the rows a stage held back.
+        """
+        stages = [stage for stage in self.ordered() if remote is None or stage.remote == remote]
+        for position, stage in enumerate(stages):
+            # An earlier rejection may have blacklisted a duplicate of a surviving pair
+            if (position or remote) and self.guard is not None:
+                rows = [row for row in rows if not self.guard(row)]
+            if not rows:
+                break
+            started = time.perf_counter()
+            results = stage.check(batch, rows)
+            survivors = []
+            held = 0
+            for row, details in zip(rows, results):
+                if details is None:
+                    survivors.append(row)
+                elif details is Stage.DEFER:
+                    held += 1
+                    if deferred is not None:
+                        deferred.append(row)
+                else:
+                    stage.reject(row, details)
+                    stage.rejected += 1
+            elapsed = time.perf_counter() - started
+            stage.checked += len(rows)
+            stage.deferred += held
+            stage.seconds += elapsed
+            if timings is not None:
+                timings[stage.name] = timings.get(stage.name, 0) + elapsed
+            if self.metrics is not None:
+                self.metrics.observe('stage_seconds', elapsed, stage=stage.name)
+                self.metrics.inc('stage_checked_total', len(rows), stage=stage.name)
+                self.metrics.inc('stage_rejected_total', len(rows) - len(survivors) - held, stage=stage.name)
+                self.metrics.inc('stage_deferred_total', held, stage=stage.name)
+            rows = survivors
+        return rows
+
+    def stats(self):
+        return [{
+            'stage': stage.name,
+            'checked': stage.checked,
+            'rejected': stage.rejected,
+            'deferred': stage.deferred,
+            'seconds': stage.seconds
+        } for stage in self.ordered()]
+
+def shard_of(address, count):
+    """Stable shard index for a pair address (crc32, so every process agrees)."""
+    return zlib.crc32((address or '').lower().encode('utf-8')) % count
+
+class ShardLink:
+    """A shard worker's side of the coordinator queues.
+
+    Stands in for the worker's Telegram notifier, so messages still go out through the
+    coordinator's single rate-limited dispatcher.
+    """
+
+    def __init__(self, index, count, events, writes):
+        self.index = index
+        self.count = count
+        self.events = events
+        self.writes = writes
+
+    def owns(self, address):
+        return shard_of(address, self.count) == self.index
+
+    def send_notification(self, message, priority=TelegramNotifier.INFO):
+        self.events.put(('notify', self.index, message, priority))
+
+    def blacklisted(self, address, reason):
+        self.events.put(('blacklist', self.index, address, reason))
+
+    def scanned(self, results, metrics):
+        self.events.put(('scanned', self.index, results, metrics))
+
+    def forward(self, index, pairs, fetch_started, received, cycle):
+        """Hand pairs this worker fetched to the shard that owns them.
+
+        They go through the coordinator: the event queue never blocks, while putting
+        straight into a peer's full inbox could leave two fetching workers waiting on
+        each other for good.
+        """
+        self.events.put(('forward', self.index, index, pairs, fetch_started, received, cycle))
+
+    def fetched(self, url, outcome, validators):
+        self.events.put(('fetched', self.index, url, outcome, validators))
+
+    def close(self, timeout=None):
+        pass
+
+def run_db_writer(db_name, writes, ready, events=None, max_batches=64):
+    """Writer process: commits every batch the shards and the coordinator queue up.
+
+    After each commit the row and error counts go back to the coordinator as a 'written'
+    event; a 'sync' marker is answered with 'synced' once everything before it is written.
+    """
+    db = Database(db_name, batch_size=0, flush_interval_ms=0)
+    ready.set()
+    stopping = False
+    while not stopping:
+        try:
+            # Rows put back by a failed commit are retried even if nothing new arrives
+            batches = [writes.get(timeout=1 if db.pending else None)]
+        except queue.Empty:
+            batches = []
+        # Whatever else is already waiting rides along in the same transaction
+        while len(batches) < max_batches:
+            try:
+                batches.append(writes.get_nowait())
+            except queue.Empty:
+                break
+        if None in batches:
+            stopping = True
+        syncs = batches.count('sync')
+        batches = [batch for batch in batches if isinstance(batch, dict)]
+        rows = sum(len(params) for batch in batches for params in batch.values())
+        if db.pending:
+            batches.insert(0, db.pending)
+            rows += db.pending_rows
+            db.pending, db.pending_rows = {}, 0
+        if batches:
+            before = (db.rows_written, db.write_seconds, db.rows_dropped, db.write_errors)
+            db.write_batches(batches, rows)
+            if events is not None:
+                after = (db.rows_written, db.write_seconds, db.rows_dropped, db.write_errors)
+                events.put(('written', -1) + tuple(new - old for new, old in zip(after, before)))
+        if events is not None:
+            for _ in range(syncs):
+                events.put(('synced', -1))
+    db.close()
+
+def run_shard_worker(config_path, link, inbox):
+    """Worker process: runs the full pipeline for the pairs of one shard."""
+    bot = DexscreenerBot(config_path, shard=link)
+    try:
+        while True:
+            message = inbox.get()
+            if message is None:
+                break
+            if message[0] == 'blacklist':
+                bot.blacklist.merge(message[1])
+                continue
+            try:
+                if message[0] == 'fetch':
+                    results = bot.fetch_for_shards(*message[1:])
+                else:
+                    _, pairs, fetch_started, received, cycle = message
+                    results = bot.process_tokens(bot.first_in_cycle(pairs, cycle), fetch_started, received)
+            except Exception as e:
+                logger.error(f"Shard {link.index} failed a {message[0]} batch: {e}")
+                results = []
+            # Metrics recorded here travel with the results and are merged by the coordinator
+            counters, histograms = bot.metrics.take()
+            link.scanned(results, (counters, histograms, bot.metrics.read_gauges()))
+            bot.log_handler.flush()
+    finally:
+        bot.close()
+
+class ShardPool:
+    """Coordinator side of sharded mode.
+
+    Pairs are split by crc32(address) across worker processes, each with its own
+    caches and detector state; a single writer process commits every database write.
+    Endpoints are fetched and parsed by the workers themselves, round robin; the pairs
+    a worker doesn't own are relayed to their shard by the coordinator. Workers report back
+    per-pair statuses (for the rescan scheduler) with their metrics, new blacklist
+    entries (relayed to the other workers) and Telegram messages.
+    """
+
+    def __init__(self, config_path, db_name, workers, queue_size=64, handle=None):
+        context = multiprocessing.get_context('spawn')
+        self.handle = handle
+        self.writes = context.Queue(queue_size)
+        self.events = context.Queue()
+        ready = context.Event()
+        self.writer = context.Process(
+            target=run_db_writer, args=(db_name, self.writes, ready, self.events), name='db-writer', daemon=True
+        )
+        self.writer.start()
+        if not ready.wait(60):
+            raise RuntimeError("Database writer process did not start.")
+
+        self.inboxes = [context.Queue(queue_size) for _ in range(workers)]
+        self.outstanding = [0] * workers
+        self.processed = 0
+        self.synced = 0
+        self.workers = []
+        for index in range(workers):
+            link = ShardLink(index, workers, self.events, self.writes)
+            worker = context.Process(
+                target=run_shard_worker, args=(config_path, link, self.inboxes[index]), name=f"shard-{index}", daemon=True
+            )
+            worker.start()
+            self.workers.append(worker)
+
+    def __len__(self):
+        return len(self.workers)
+
+    def dispatch(self, pairs, fetch_started, received):
+        shards = [[] for _ in self.workers]
+        for pair in pairs:
+            shards[shard_of(pair.get('pairAddress'), len(shards))].append(pair)
+        for index, shard in enumerate(shards):
+            if shard:
+                self.inboxes[index].put(('pairs', shard, fetch_started, received, None))
+                self.outstanding[index] += 1
+        self.drain()
+
+    def fetch(self, index, url, validators, cycle):
+        """Have worker index fetch and parse url; pairs of one cycle are processed once each."""
+        self.inboxes[index].put(('fetch', url, validators, cycle))
+        self.outstanding[index] += 1
+        self.drain()
+
+    def broadcast_blacklist(self, address, source):
+        for index, inbox in enumerate(self.inboxes):
+            if index != source:
+                inbox.put(('blacklist', address))
+
+    def drain(self, timeout=0):
+        """Handle worker events; waits up to timeout seconds for the first one."""
+        try:
+            event = self.events.get(timeout=timeout) if timeout else self.events.get_nowait()
+        except queue.Empty:
+            return
+        while True:
+            if event[0] == 'scanned':
+                self.outstanding[event[1]] -= 1
+                self.processed += len(event[2])
+            elif event[0] == 'forward':
+                # Arrives before the sender's own 'scanned', so wait() can't finish early
+                self.inboxes[event[2]].put(('pairs',) + event[3:])
+                self.outstanding[event[2]] += 1
+            elif event[0] == 'synced':
+                self.synced += 1
+            elif event[0] == 'blacklist':
+                self.broadcast_blacklist(event[2], event[1])
+            if self.handle is not None:
+                self.handle(event)
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                return
+
+    def wait(self):
+        """Block until every dispatched batch has been processed; returns the pairs processed since the last wait."""
+        while any(self.outstanding):
+            self.drain(timeout=1)
+            for index, worker in enumerate(self.workers):
+                if self.outstanding[index] and not worker.is_alive():
+                    logger.error(f"Shard worker {index} exited with code {worker.exitcode}; dropping its pending batches.")
+                    self.outstanding[index] = 0
+        processed, self.processed = self.processed, 0
+        return processed
+
+    def sync(self, timeout=60):
+        """Block until the writer has committed everything queued before this call."""
+        target = self.synced + 1
+        self.writes.put('sync')
+        deadline = time.monotonic() + timeout
+        while self.synced < target and time.monotonic() < deadline and self.writer.is_alive():
+            self.drain(timeout=0.5)
+
+    def stop_workers(self, timeout=30):
+        for inbox in self.inboxes:
+            inbox.put(None)
+        deadline = time.monotonic() + timeout
+        while any(worker.is_alive() for worker in self.workers) and time.monotonic() < deadline:
+            # Keep taking events so no worker blocks on a full pipe while shutting down
+            self.drain(timeout=0.1)
+        self.drain()
+        for worker in self.workers:
+            worker.join(max(0, deadline - time.monotonic()))
+
+    def stop_writer(self, timeout=30):
+        self.writes.put(None)
+        self.writer.join(timeout)
+
 class DexscreenerBot:
-    def __init__(self, config_path: str):
+    TRADE_STATUSES = ('new_pair', 'pumped')
+
+    def __init__(self, config_path: str, shard=None):
         try:
             with open(config_path, 'r') as file:
                 self.config = yaml.safe_load(file)
@@ -334,167 +2508,693 @@ class DexscreenerBot:
             if section not in self.config:
                 raise ValueError(f"Missing required config section: {section}")
 
+        monitoring_config = self.config.get('monitoring', {}) or {}
+        self.log_handler = configure_logging(monitoring_config)
+        self.metrics = Metrics()
+        self.metrics_file = monitoring_config.get('metrics_file')
+        self.profile_dir = monitoring_config.get('profile_dir', 'profiles')
+        self.profile_requested = threading.Event()
+
         db_config = self.config['database']
         if db_config.get('type') != 'sqlite':
             raise ValueError("Only SQLite database is supported.")
-        self.db = Database(db_config['name'])
+        # A shard worker (shard is its ShardLink) runs the pipeline; the coordinator only fetches and schedules
+        self.shard = shard
+        self.shards = None
+        sharding_config = self.config.get('sharding', {}) or {}
+        if shard is None and sharding_config.get('workers', 0) > 0:
+            self.shards = ShardPool(
+                config_path, db_config['name'], sharding_config['workers'],
+                sharding_config.get('queue_size', 64), self._handle_shard_event
+            )
+        write_queue = shard.writes if shard is not None else self.shards.writes if self.shards is not None else None
+        self.db = Database(
+            db_config['name'],
+            batch_size=db_config.get('batch_size', 500),
+            flush_interval_ms=db_config.get('flush_interval_ms', 1000),
+            write_queue=write_queue
+        )
         
-        self.blacklist = Blacklist(config_path)
-        self.fake_volume_detector = FakeVolumeDetector(self.config)
-        self.rugcheck = Rugcheck(self.config)
+        http_config = self.config.get('http', {}) or {}
+        self.http = HttpClient(http_config, self.metrics)
+        self.max_workers = http_config.get('max_workers', 16)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers) if self.max_workers > 1 else None
+
+        self.blacklist = Blacklist(
+            config_path, self.db, self.config['blacklist'].get('compact_interval', 300) if shard is None else None,
+            shard.blacklisted if shard is not None else None, self.config['blacklist'].get('file', 'blacklist.yaml')
+        )
+        self.analyze_interval = self.config['analysis'].get('analyze_interval', 3600)
+        self.rug_check_interval = self.config['analysis'].get('rug_check_interval', 1800)
+        self.rugcheck_cache = VerdictCache(
+            self.db, self.rug_check_interval, self.config['analysis'].get('rug_cache_size', 10000),
+            # Expired verdicts are purged once, by the coordinator
+            purge=shard is None
+        )
+
+        self.fake_volume_detector = FakeVolumeDetector(self.config, self.http)
+        self.rugcheck = Rugcheck(self.config, self.http, self.rugcheck_cache)
         self.filters = self.config.get('filters', {})
+        self.evaluator = BatchEvaluator(self.filters, self.fake_volume_detector, self.determine_status)
+        self.pipeline = self._build_pipeline(self.config['analysis'].get('adaptive_stage_order', True))
+        incremental_config = self.config.get('incremental', {}) or {}
+        self.fingerprints = None
+        if incremental_config.get('enabled', False):
+            self.fingerprints = FingerprintIndex(self.db, incremental_config, shard.owns if shard is not None else None)
+        self.snapshots = SnapshotStore(self.db, self.config.get('snapshots', {}) or {})
         self.telegram = self.config.get('telegram', {})
-        self.notifier = TelegramNotifier(self.telegram.get('bot_token'), self.telegram.get('chat_id'))
+        # Workers hand their messages to the coordinator's dispatcher, which owns the chat rate limit
+        self.notifier = shard if shard is not None else TelegramNotifier(
+            self.telegram.get('bot_token'), self.telegram.get('chat_id'), self.http, self.telegram.get('notifications'),
+            self.telegram.get('api_url', 'https://api.telegram.org')
+        )
         self.trader = ToxiSolTrader(
             self.telegram.get('toxisol_bot'),
             self.telegram.get('wallet_address'),
             self.telegram.get('wallet_private_key')
         )
+        self.trade_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='trade')
+        # Pairs already bought (or with a buy in flight); rescans of them never buy again
+        self.traded = self.db.fetch_traded_addresses()
+        self.latency = LatencyTracker(self.db, self.config['analysis'].get('latency_window', 1000))
         
         self.api_url = self.config['dexscreener'].get('api_url')
         if not self.api_url:
             raise ValueError("Missing DEXScreener API URL in config.")
-        
-        self.analyze_interval = self.config['analysis'].get('analyze_interval', 3600)
-        self.rug_check_interval = self.config['analysis'].get('rug_check_interval', 1800)
+        dexscreener_config = self.config['dexscreener']
+        self.streaming = dexscreener_config.get('streaming', False)
+        self.stream_chunk_size = dexscreener_config.get('stream_chunk_size', 500)
+        self.stream_buffer = dexscreener_config.get('stream_buffer', 2000)
+        endpoints = dexscreener_config.get('endpoints') or [self.api_url]
+        rate_limit = dexscreener_config.get('rate_limit', 5)
+        self.poller = Poller(
+            self.http, endpoints, TokenBucket(rate_limit, dexscreener_config.get('burst', rate_limit)),
+            self.stream_buffer, self.max_workers, dexscreener_config.get('pairs_url')
+        )
+        self.poll_interval = self.config['analysis'].get('poll_interval', self.analyze_interval)
+        # Sharded mode: fetch cycles let owners drop pairs listed by more than one endpoint
+        self.fetch_cycle = 0
+        self.cycle = None
+        self.cycle_seen = set()
+        self.shard_gauges = {}
+        self.report_limit = self.config['analysis'].get('report_limit', 50)
+
+        scheduler_config = self.config.get('scheduler', {}) or {}
+        self.scheduler = None
+        if scheduler_config.get('enabled', False) and shard is None:
+            if not self.poller.pairs_url:
+                raise ValueError("The rescan scheduler needs dexscreener.pairs_url in config.")
+            self.scheduler = RescanScheduler(scheduler_config.get('intervals'), scheduler_config.get('max_due_per_tick', 300))
+            for address, status, last_updated in self.db.fetch_token_schedule():
+                self.scheduler.schedule(address, status, last_updated or 0)
+
+        self.register_gauges()
+        self.metrics_server = None
+        if monitoring_config.get('metrics_port') and shard is None:
+            try:
+                self.metrics_server = MetricsServer(
+                    self.metrics, monitoring_config.get('metrics_host', '127.0.0.1'),
+                    monitoring_config['metrics_port'], self.request_profile
+                )
+            except OSError as e:
+                print(f"Error starting metrics server: {e}")
+        if shard is None and hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.request_profile())
+
+    def register_gauges(self):
+        cache = self.rugcheck_cache
+        self.metrics.gauge('rugcheck_cache_hit_rate', lambda: cache.stats()['hit_rate'])
+        self.metrics.gauge('rugcheck_cache_lookups', lambda: cache.stats()['memory_hits'], result='memory_hit')
+        self.metrics.gauge('rugcheck_cache_lookups', lambda: cache.stats()['disk_hits'], result='disk_hit')
+        self.metrics.gauge('rugcheck_cache_lookups', lambda: cache.stats()['misses'], result='miss')
+        self.metrics.gauge('rugcheck_cache_size', lambda: cache.stats()['size'])
+        poller = self.poller
+        self.metrics.gauge('poller_requests', lambda: poller.stats()['requests'])
+        self.metrics.gauge('poller_not_modified', lambda: poller.stats()['not_modified'])
+        self.metrics.gauge('poller_errors', lambda: poller.stats()['errors'])
+        self.metrics.gauge('db_pending_rows', lambda: self.db.pending_rows)
+        self.metrics.gauge('db_rows_written', lambda: self.db.rows_written)
+        self.metrics.gauge('db_write_seconds', lambda: self.db.write_seconds)
+        self.metrics.gauge('db_write_errors', lambda: self.db.write_errors)
+        self.metrics.gauge('db_rows_dropped', lambda: self.db.rows_dropped)
+        if self.scheduler is not None:
+            self.metrics.gauge('scheduled_pairs', lambda: len(self.scheduler))
+        for stat, quantile in (('p50', '0.5'), ('p99', '0.99')):
+            self.metrics.gauge('trade_latency_ms', lambda stat=stat: (self.latency.summary() or {}).get(stat), quantile=quantile)
+
+    def request_profile(self):
+        """Profile the next poll cycle with cProfile; the stats are written under profile_dir."""
+        self.profile_requested.set()
 
     def fetch_tokens(self) -> list:
+        with self.metrics.timer('stage_seconds', stage='fetch'):
+            return self.poller.poll()
+
+    def stream_tokens(self):
+        return self.poller.stream()
+
+    def scan(self):
+        """Fetch and process one round of every endpoint; returns how many pairs were processed."""
+        if self.shards is not None:
+            return self._scan_shards()
+        if self.streaming:
+            return self.process_stream(self.stream_tokens())
+        fetch_started = time.monotonic()
+        tokens = self.fetch_tokens()
+        if tokens:
+            self.process_tokens(tokens, fetch_started)
+        return len(tokens)
+
+    def _scan_shards(self):
+        # The workers fetch and parse, so JSON decoding is spread over the shards too
+        self.fetch_cycle += 1
+        for position, url in enumerate(self.poller.endpoints):
+            self.poller.rate_limiter.acquire()
+            with self.poller.lock:
+                validators = self.poller.validators.get(url)
+            self.shards.fetch(position % len(self.shards), url, validators, self.fetch_cycle)
+        return self.shards.wait()
+
+    def fetch_for_shards(self, url, validators, cycle):
+        """Shard worker: fetch and parse url, process this shard's pairs and forward the others to their owners."""
+        link = self.shard
+        fetch_started = time.monotonic()
+        chunks = [[] for _ in range(link.count)]
+        received = [None] * link.count
+        results = []
+        processing = 0.0
+        outcome = 'error'
+
+        def ship(index):
+            nonlocal processing
+            pairs, chunks[index] = chunks[index], []
+            if index == link.index:
+                started = time.perf_counter()
+                results.extend(self.process_tokens(self.first_in_cycle(pairs, cycle), fetch_started, received[index]))
+                processing += time.perf_counter() - started
+            else:
+                link.forward(index, pairs, fetch_started, received[index], cycle)
+
+        def emit(pair):
+            index = shard_of(pair.get('pairAddress'), link.count)
+            if not chunks[index]:
+                received[index] = time.monotonic()
+            chunks[index].append(pair)
+            if len(chunks[index]) >= self.stream_chunk_size:
+                ship(index)
+            return True
+
+        started = time.perf_counter()
         try:
-            response = requests.get(self.api_url)
-            response.raise_for_status()
-            data = response.json()
-            return data.get('pairs', [])
-        except requests.RequestException as e:
-            print(f"Error fetching data: {e}")
-            return []
+            outcome, validators = self.poller.fetch(url, emit, validators)
+            for index, pairs in enumerate(chunks):
+                if pairs:
+                    ship(index)
+        finally:
+            # Reported even on failure, so the coordinator's poller stats stay complete
+            link.fetched(url, outcome, validators)
+            self.metrics.observe('stage_seconds', time.perf_counter() - started - processing, stage='fetch')
+        return results
+
+    def first_in_cycle(self, pairs, cycle):
+        """Drop pairs this shard already processed in the same fetch cycle (endpoints overlap)."""
+        if cycle is None:
+            return pairs
+        if cycle != self.cycle:
+            self.cycle, self.cycle_seen = cycle, set()
+        fresh = []
+        for pair in pairs:
+            address = pair.get('pairAddress')
+            if address is not None:
+                if address in self.cycle_seen:
+                    continue
+                self.cycle_seen.add(address)
+            fresh.append(pair)
+        return fresh
+
+    def flush(self):
+        """Commit everything queued so far; in sharded mode also waits for the writer process."""
+        self.db.flush()
+        if self.shards is not None:
+            self.shards.sync()
+
+    def process_stream(self, pairs):
+        """Process an iterable of pairs in bounded chunks; returns how many were processed."""
+        pairs = iter(pairs)
+        processed = 0
+        fetch_started = time.monotonic()
+        while True:
+            waited = time.perf_counter()
+            first = next(pairs, None)
+            if first is None:
+                break
+            received = time.monotonic()
+            chunk = [first] + list(itertools.islice(pairs, self.stream_chunk_size - 1))
+            # Time spent waiting on the network for this chunk
+            self.metrics.observe('stage_seconds', time.perf_counter() - waited, stage='fetch')
+            self.process_tokens(chunk, fetch_started, received)
+            processed += len(chunk)
+        if self.shards is not None:
+            self.shards.wait()
+        return processed
 
     def check_cex_listing(self, token):
         return False  # Placeholder
 
-    def determine_status(self, token):
-        is_pump, pump_details = Filters.detect_pump(token, self.filters)
-        if is_pump:
-            return 'pumped', pump_details
-        is_rug, rug_details = Filters.detect_rug(token, self.filters)
-        if is_rug:
-            return 'rugged', rug_details
-        is_new, new_details = Filters.is_new_pair(token, self.filters)
-        if is_new:
-            return 'new_pair', new_details
-        return 'stable', "No significant patterns detected"
+    def determine_status(self, token, now=None):
+        return Filters.determine_status(token, self.filters, now)
 
-    def process_tokens(self, tokens: list):
-        for token in tokens:
-            address = token.get('pairAddress')
-            dev_address = token.get('dev_address')
-            liquidity = token.get('liquidity', {}).get('usd', 0)
-            price_change = token.get('priceChange', {}).get('h24', 0)
-            market_cap = token.get('marketCap', 0)
-            volume = token.get('volume', {}).get('h24', 0)
-            total_supply = token.get('totalSupply', 1)
-
-            token_data = {
-                'address': address,
-                'name': token.get('baseToken', {}).get('name'),
-                'symbol': token.get('baseToken', {}).get('symbol'),
-                'market_cap': market_cap,
-                'volume': volume,
-                'liquidity': liquidity,
-                'price_usd': token.get('priceUsd', 0),
-                'price_change_24h': price_change,
-                'pair_created_at': token.get('pairCreatedAt', 0),
-                'total_supply': total_supply,
-                'status': None,
-                'listed_on_cex': self.check_cex_listing(token),
-                'dev_address': dev_address
-            }
+    def _fan_out(self, fn, items):
+        """Run a per-token network check over items, concurrently when a pool is configured."""
+        if self.executor is None or len(items) < 2:
+            return [fn(item) for item in items]
+        return list(self.executor.map(fn, items))
 
-            # Check blacklists
-            if self.blacklist.is_coin_blacklisted(address):
-                print(f"Coin {token_data['name']} ({address}) is blacklisted.")
-                continue
-            if self.blacklist.is_dev_blacklisted(dev_address):
-                print(f"Developer of {token_data['name']} ({dev_address}) is blacklisted.")
-                continue
+    def _parse_token(self, token):
+        return TokenRecord.from_pair(token, self.check_cex_listing(token))
 
-            # Check Rugcheck.xyz
-            is_good, rugcheck_details = self.rugcheck.check_token(address)
-            if not is_good:
-                self.blacklist.add_coin_to_blacklist(address, f"Rugcheck failed: {rugcheck_details}")
-                self.db.insert_pattern(address, 'rugcheck_failed', rugcheck_details)
-                print(f"Coin {token_data['name']} ({address}) failed Rugcheck: {rugcheck_details}")
-                continue
+    def _is_blacklisted(self, token_data):
+        address = token_data.address
+        dev_address = token_data.dev_address
+        if self.blacklist.is_coin_blacklisted(address):
+            logger.info(f"Coin {token_data.name} ({address}) is blacklisted.")
+            return True
+        if self.blacklist.is_dev_blacklisted(dev_address):
+            logger.info(f"Developer of {token_data.name} ({dev_address}) is blacklisted.")
+            return True
+        return False
+
+    def _build_pipeline(self, adaptive):
+        # The checks that blacklist a coin run before the filters, so a pair with fake volume
+        # or a bundle is blacklisted whether or not it also fails a threshold
+        stages = [
+            Stage('blacklist', 0, self._check_blacklist, lambda row, details: None),
+            Stage('bundle', 5, self._check_bundle, self._reject_bundle, group=1),
+            Stage('fake_volume', 2, self._check_fake_volume, self._reject_fake_volume, group=1),
+            Stage('filters', 1, self._check_filters, self._reject_filters, group=2),
+            # Remote checks keep their own order too: a pair failing both is always recorded
+            # as rugcheck_failed, as it was before the checks were split out
+            Stage('rugcheck', 1000, self._check_rugcheck, self._reject_rugcheck, remote=True, group=3),
+            Stage('pocket_universe', 1000, self._check_pocket_universe, self._reject_fake_volume, remote=True, group=4)
+        ]
+        return Pipeline(stages, guard=lambda row: self._is_blacklisted(row[1]), adaptive=adaptive, metrics=self.metrics)
+
+    def _check_blacklist(self, batch, rows):
+        return ['blacklisted' if self._is_blacklisted(token_data) else None for _, token_data in rows]
+
+    def _check_filters(self, batch, rows):
+        results = []
+        for i, _ in rows:
+            passed, reason = batch.filters(i)
+            results.append(None if passed else reason)
+        return results
+
+    def _reject_filters(self, row, filter_reason):
+        token_data = row[1]
+        logger.info(f"Coin {token_data.name} ({token_data.address}) failed filters: {filter_reason}")
+
+    def _check_fake_volume(self, batch, rows):
+        results = []
+        for i, _ in rows:
+            verdict = batch.fake_volume(i)
+            results.append(verdict[1] if verdict is not None and verdict[0] else None)
+        return results
+
+    def _check_pocket_universe(self, batch, rows):
+        # Rows the local heuristics already decided (including errors) never reach the API
+        undecided = [token_data for i, token_data in rows if batch.fake_volume(i) is None]
+        remote = iter(self._fan_out(self.fake_volume_detector.check_remote, undecided))
+        results = []
+        for i, _ in rows:
+            if batch.fake_volume(i) is None:
+                is_fake, fake_reason = next(remote)
+                results.append(Stage.DEFER if is_fake is None else fake_reason if is_fake else None)
+            else:
+                results.append(None)
+        return results
+
+    def _reject_fake_volume(self, row, fake_reason):
+        token_data = row[1]
+        address = token_data.address
+        self.blacklist.add_coin_to_blacklist(address, fake_reason)
+        self.db.insert_pattern(address, 'fake_volume', fake_reason)
+        logger.info(f"Coin {token_data.name} ({address}) blacklisted for fake volume: {fake_reason}")
 
-            # Check for bundle purchases
+    def _check_bundle(self, batch, rows):
+        results = []
+        for _, token_data in rows:
             is_bundle, bundle_details = self.rugcheck.detect_bundle(token_data)
-            if is_bundle:
-                self.blacklist.add_coin_to_blacklist(address, f"Bundle detected: {bundle_details}")
-                self.db.insert_pattern(address, 'bundle_detected', bundle_details)
-                print(f"Coin {token_data['name']} ({address}) blacklisted for bundle: {bundle_details}")
-                continue
+            results.append(bundle_details if is_bundle else None)
+        return results
 
-            # Check for fake volume
-            is_fake, fake_reason = self.fake_volume_detector.detect_fake_volume(token_data)
-            if is_fake:
-                self.blacklist.add_coin_to_blacklist(address, fake_reason)
-                self.db.insert_pattern(address, 'fake_volume', fake_reason)
-                print(f"Coin {token_data['name']} ({address}) blacklisted for fake volume: {fake_reason}")
-                continue
+    def _reject_bundle(self, row, bundle_details):
+        token_data = row[1]
+        address = token_data.address
+        self.blacklist.add_coin_to_blacklist(address, f"Bundle detected: {bundle_details}")
+        self.db.insert_pattern(address, 'bundle_detected', bundle_details)
+        logger.info(f"Coin {token_data.name} ({address}) blacklisted for bundle: {bundle_details}")
 
-            # Apply filters
-            passed_filters, filter_reason = Filters.apply_filters(token_data, self.filters)
-            if not passed_filters:
-                print(f"Coin {token_data['name']} ({address}) failed filters: {filter_reason}")
-                continue
+    def _check_rugcheck(self, batch, rows):
+        verdicts = self._fan_out(self.rugcheck.check_token, [token_data.address for _, token_data in rows])
+        return [
+            Stage.DEFER if is_good is None else None if is_good else rugcheck_details
+            for is_good, rugcheck_details in verdicts
+        ]
 
-            # Determine status
-            token_data['status'], status_details = self.determine_status(token_data)
+    def _reject_rugcheck(self, row, rugcheck_details):
+        token_data = row[1]
+        address = token_data.address
+        self.blacklist.add_coin_to_blacklist(address, f"Rugcheck failed: {rugcheck_details}")
+        self.db.insert_pattern(address, 'rugcheck_failed', rugcheck_details)
+        logger.info(f"Coin {token_data.name} ({address}) failed Rugcheck: {rugcheck_details}")
 
-            # Execute trade via ToxiSol for new pairs or pumps
-            if token_data['status'] in ['new_pair', 'pumped']:
-                success, trade_details = self.trader.execute_trade(address, 'buy', 0.1)  # Example: Buy 0.1 SOL
-                if success:
-                    self.notifier.send_notification(f"Buy executed for {token_data['name']} ({address}): {trade_details}")
-                    self.db.insert_pattern(address, 'buy_executed', trade_details)
+    def process_tokens(self, tokens: list, fetch_started=None, received=None):
+        received = time.monotonic() if received is None else received
+        fetch_started = received if fetch_started is None else fetch_started
+        if self.shards is not None:
+            self.shards.dispatch(tokens, fetch_started, received)
+            return []
+        parsed = candidates = [self._parse_token(token) for token in tokens]
+        self.metrics.inc('pairs_total', len(parsed))
+        now = int(datetime.now().timestamp())
+        for token_data in candidates:
+            if token_data.address:
+                self.snapshots.append(token_data, now)
+
+        if self.fingerprints is not None:
+            changed = []
+            for token_data in candidates:
+                if self.fingerprints.is_unchanged(token_data, now):
+                    self.db.touch_token(token_data.address, now)
                 else:
-                    print(f"Trade failed: {trade_details}")
+                    changed.append(token_data)
+            logger.info(f"Incremental scan: {len(changed)} new or changed pairs, {len(candidates) - len(changed)} unchanged.")
+            self.metrics.inc('pairs_unchanged_total', len(candidates) - len(changed))
+            candidates = changed
+
+        # Real 6h volume baseline for the spike check; the snapshot taken at `now` is excluded
+        volume_h6 = self.snapshots.baselines([t.address for t in candidates if t.address], 'volume', 6 * 3600, now)
+        for token_data in candidates:
+            token_data.volume_h6 = volume_h6.get(token_data.address, 0)
+
+        # Local checks for the whole scan in one vectorized pass
+        batch = self.evaluator.evaluate(candidates)
+        timings = {}
+        rows = self.pipeline.run(batch, list(enumerate(candidates)), remote=False, timings=timings)
+
+        statuses = {}
+        signals, others = [], []
+        with self.metrics.timer('stage_seconds', stage='status'):
+            for row in rows:
+                statuses[row[0]] = batch.status(row[0])
+                (signals if statuses[row[0]][0] in self.TRADE_STATUSES else others).append(row)
+
+        # Fast lane: tradeable pairs clear the remote checks first and go straight to the
+        # trade executor; persistence and notifications happen off this path.
+        # Pairs a remote check couldn't decide (API down or rate limited) are retried next cycle
+        deferred = []
+        survivors = self.pipeline.run(batch, signals, remote=True, timings=timings, deferred=deferred)
+        for i, token_data in survivors:
+            if self._is_blacklisted(token_data):
+                continue
+            if token_data.address in self.traded:
+                logger.debug(f"Already bought {token_data.name} ({token_data.address}); not buying again.")
+                self.metrics.inc('trades_total', result='already_traded')
+                continue
+            self._dispatch_trade(token_data, {
+                'fetch_started': fetch_started,
+                'received': received,
+                'stages': dict(timings),
+                'qualified': time.monotonic()
+            })
+        survivors += self.pipeline.run(batch, others, remote=True, deferred=deferred)
+        if deferred:
+            logger.warning(f"Deferred {len(deferred)} pairs to the next cycle: a remote check was unavailable.")
+
+        if self.fingerprints is not None:
+            # Deferred pairs get no fingerprint, so the next scan checks them in full
+            held = {i for i, _ in deferred}
+            for i, token_data in enumerate(candidates):
+                if i not in held:
+                    self.fingerprints.record(token_data, now)
+
+        started = time.perf_counter()
+        for i, token_data in survivors:
+            address = token_data.address
+            if self._is_blacklisted(token_data):
+                continue
+            token_data.status, status_details = statuses[i]
 
             # Save token data
             self.db.insert_or_update_token(token_data)
 
             # Log patterns
-            if token_data['status'] in ['pumped', 'rugged', 'new_pair']:
-                self.db.insert_pattern(address, token_data['status'], status_details)
-                print(f"Pattern detected for {token_data['name']} ({address}): {token_data['status']} - {status_details}")
+            if token_data.status in ['pumped', 'rugged', 'new_pair']:
+                self.db.insert_pattern(address, token_data.status, status_details)
+                logger.info(f"Pattern detected for {token_data.name} ({address}): {token_data.status} - {status_details}")
+        persist_seconds = time.perf_counter() - started
+
+        # (address, status, blacklisted) per pair, for the rescan scheduler here or in the coordinator
+        results = []
+        if self.scheduler is not None or self.shard is not None:
+            results = [
+                (token_data.address, token_data.status,
+                 self.blacklist.is_coin_blacklisted(token_data.address) or self.blacklist.is_dev_blacklisted(token_data.dev_address))
+                for token_data in parsed if token_data.address
+            ]
+        if self.scheduler is not None:
+            self._schedule(results, now)
+
+        # One transaction per scan cycle
+        started = time.perf_counter()
+        self.db.flush()
+        self.metrics.observe('stage_seconds', persist_seconds + time.perf_counter() - started, stage='database')
+        return results
+
+    def _schedule(self, results, now):
+        # Pairs skipped as unchanged or rejected keep the cadence of their last known status
+        for address, status, blacklisted in results:
+            if blacklisted:
+                self.scheduler.forget(address)
+            else:
+                self.scheduler.schedule(address, status, now)
+
+    def _handle_shard_event(self, event):
+        kind = event[0]
+        if kind == 'scanned':
+            self._merge_shard_metrics(event[1], event[3])
+            if self.scheduler is not None:
+                self._schedule(event[2], int(datetime.now().timestamp()))
+        elif kind == 'fetched':
+            self.poller.record(event[2], event[3], event[4])
+        elif kind == 'written':
+            _, _, rows, seconds, dropped, errors = event
+            self.db.rows_written += rows
+            self.db.write_seconds += seconds
+            self.db.rows_dropped += dropped
+            self.db.write_errors += errors
+        elif kind == 'blacklist':
+            self.blacklist.merge(event[2])
+        elif kind == 'notify':
+            self.notifier.send_notification(event[2], event[3])
+
+    def _merge_shard_metrics(self, index, metrics):
+        counters, histograms, gauges = metrics
+        self.metrics.merge(counters, histograms)
+        # Worker gauges (caches, latency, pending rows) are exported per shard
+        known = self.shard_gauges.setdefault(index, {})
+        for key, value in gauges.items():
+            if key not in known:
+                name, labels = key
+                self.metrics.gauge(name, lambda index=index, key=key: self.shard_gauges[index][key], shard=index, **dict(labels))
+            known[key] = value
+
+    def _dispatch_trade(self, token_data, trace):
+        trace['dispatched'] = time.monotonic()
+        self.traded.add(token_data.address)
+        self.trade_executor.submit(self._execute_trade, token_data, trace)
+
+    def _execute_trade(self, token_data, trace):
+        # Execute trade via ToxiSol for new pairs or pumps
+        address = token_data.address
+        try:
+            with self.metrics.timer('stage_seconds', stage='trade'):
+                success, trade_details = self.trader.execute_trade(address, 'buy', 0.1)  # Example: Buy 0.1 SOL
+            self.latency.record(address, trace, time.monotonic())
+            self.metrics.inc('trades_total', result='success' if success else 'failed')
+            if success:
+                self.notifier.send_notification(
+                    f"Buy executed for {token_data.name} ({address}): {trade_details}", TelegramNotifier.TRADE
+                )
+                self.db.insert_pattern(address, 'buy_executed', trade_details)
+            else:
+                # A failed buy may be retried on a later scan
+                self.traded.discard(address)
+                logger.warning(f"Trade failed: {trade_details}")
+        except Exception as e:
+            self.traded.discard(address)
+            self.metrics.inc('trades_total', result='error')
+            logger.error(f"Trade error for {address}: {e}")
+
+    def report_stages(self):
+        print("\nStage Statistics:")
+        stages = self.pipeline.stats()
+        if self.shards is not None:
+            # The pipelines run in the workers; their counts arrive with the merged metrics
+            checked = self.metrics.counts('stage_checked_total')
+            rejected = self.metrics.counts('stage_rejected_total')
+            deferred = self.metrics.counts('stage_deferred_total')
+            seconds = self.metrics.totals('stage_seconds')
+            stages = [{
+                'stage': stage['stage'],
+                'checked': checked.get((stage['stage'],), 0),
+                'rejected': rejected.get((stage['stage'],), 0),
+                'deferred': deferred.get((stage['stage'],), 0),
+                'seconds': seconds.get((stage['stage'],), (0, 0))[0]
+            } for stage in stages]
+        for stage in stages:
+            held = f", {stage['deferred']} deferred" if stage['deferred'] else ""
+            print(f"{stage['stage']}: {stage['rejected']}/{stage['checked']} rejected{held} in {stage['seconds']:.3f}s")
 
     def analyze_patterns(self):
-        patterns = self.db.fetch_patterns()
+        # Only patterns recorded since the previous report; the cursor survives restarts
+        last_id = self.db.get_state('last_reported_pattern', 0)
+        patterns, remaining, last_id = self.db.fetch_patterns_since(last_id, self.report_limit)
         print("\nPattern Analysis:")
         if not patterns:
-            print("No patterns detected yet.")
+            print("No new patterns since the last report.")
         for pattern in patterns:
             print(f"Token: {pattern[1]}, Type: {pattern[2]}, Details: {pattern[4]}, Detected: {datetime.fromtimestamp(pattern[3])}")
+        if remaining:
+            print(f"... and {remaining} more.")
+        # Patterns past the listing are skipped with it; anything committed later is in the next report
+        self.db.set_state('last_reported_pattern', last_id)
 
-        coins = self.db.fetch_all_coins()
-        top_coins = sorted(coins, key=lambda x: x[3], reverse=True)[:10]
+        counts = self.db.fetch_pattern_counts()
+        if counts:
+            print("\nPatterns by Type:")
+            for pattern_type, count in counts:
+                print(f"{pattern_type}: {count}")
+
+        top_coins = self.db.fetch_top_coins(10)
         print("\nTop 10 Coins by Market Cap:")
         for coin in top_coins:
             print(f"{coin[1]} ({coin[2]}): Market Cap = ${coin[3]:,.2f}, Volume = ${coin[4]:,.2f}")
 
+    def report(self):
+        self.analyze_patterns()
+        self.report_stages()
+        stats = self.rugcheck_cache.stats()
+        print(f"Rugcheck cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.1%} of lookups served without an API call)")
+        stats = self.poller.stats()
+        print(f"Poller: {stats['requests']} requests, {stats['not_modified']} not modified, {stats['errors']} errors")
+        stats = self.latency.summary()
+        if stats:
+            print(f"Trade latency: p50 {stats['p50']:.1f}ms, p99 {stats['p99']:.1f}ms, max {stats['max']:.1f}ms over {stats['count']} trades")
+
+    def rescan_due(self):
+        """Re-fetch and process the pairs whose scheduled check is due; returns how many were due."""
+        due = self.scheduler.pop_due(int(datetime.now().timestamp()))
+        if not due:
+            return 0
+        seen = set()
+
+        def track(pairs):
+            for pair in pairs:
+                seen.add(pair.get('pairAddress'))
+                yield pair
+
+        self.process_stream(track(self.poller.stream_pairs(due)))
+        now = int(datetime.now().timestamp())
+        for address in due:
+            if address not in seen:
+                self.scheduler.schedule(address, 'missing', now)
+        return len(due)
+
+    def poll(self):
+        if not self.profile_requested.is_set():
+            return self._poll()
+        self.profile_requested.clear()
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(self._poll)
+        finally:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = os.path.join(self.profile_dir, f"cycle-{datetime.now().strftime('%Y%m%d-%H%M%S')}.prof")
+            profiler.dump_stats(path)
+            print(f"Profiled poll cycle written to {path}")
+
+    def _poll(self):
+        started = time.perf_counter()
+        print(f"Fetching tokens at {datetime.now()}")
+        processed = self.scan()
+        if processed:
+            self.blacklist.compact()
+            self.snapshots.compact(int(datetime.now().timestamp()))
+        else:
+            print("No new pairs fetched.")
+        self.metrics.observe('cycle_seconds', time.perf_counter() - started)
+        self.metrics.inc('cycles_total')
+
     def run(self):
+        last_report = None
+        next_poll = time.monotonic()
         while True:
-            print(f"Fetching tokens at {datetime.now()}")
-            tokens = self.fetch_tokens()
-            if tokens:
-                self.process_tokens(tokens)
-                self.analyze_patterns()
-            else:
-                print("No tokens fetched. Check API or network.")
-            print(f"Sleeping for {self.analyze_interval} seconds...\n")
-            time.sleep(self.analyze_interval)
+            if time.monotonic() >= next_poll:
+                self.poll()
+                next_poll = time.monotonic() + self.poll_interval
+            if self.scheduler is not None:
+                rescanned = self.rescan_due()
+                if rescanned:
+                    print(f"Rescanned {rescanned} due pairs; {len(self.scheduler)} scheduled.")
+            # Polling can run every few seconds; the reports keep the slower analysis cadence
+            if last_report is None or time.monotonic() - last_report >= self.analyze_interval:
+                self.report()
+                last_report = time.monotonic()
+            self.log_handler.flush()
+            if self.metrics_file:
+                try:
+                    self.metrics.dump(self.metrics_file)
+                except OSError as e:
+                    print(f"Error writing metrics to {self.metrics_file}: {e}")
+
+            delay = next_poll - time.monotonic()
+            if self.scheduler is not None:
+                next_due = self.scheduler.next_due()
+                if next_due is not None:
+                    delay = min(delay, next_due - datetime.now().timestamp())
+            time.sleep(max(0, delay))
+
+    def close(self):
+        if getattr(self, 'closed', False):
+            return
+        self.closed = True
+        if getattr(self, 'shards', None) is not None:
+            self.shards.stop_workers()
+        if hasattr(self, 'blacklist'):
+            self.blacklist.compact(force=True)
+        if getattr(self, 'executor', None) is not None:
+            self.executor.shutdown(wait=False)
+        if hasattr(self, 'trade_executor'):
+            self.trade_executor.shutdown(wait=True)
+        if getattr(self, 'metrics_server', None) is not None:
+            self.metrics_server.close()
+        if hasattr(self, 'poller'):
+            self.poller.close()
+        if hasattr(self, 'notifier'):
+            self.notifier.close()
+        if hasattr(self, 'http'):
+            self.http.close()
+        if hasattr(self, 'log_handler'):
+            self.log_handler.flush()
+        if hasattr(self, 'db'):
+            self.db.close()
+        if getattr(self, 'shards', None) is not None:
+            self.shards.stop_writer()
 
     def __del__(self):
-        self.db.close()
+        self.close()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,432 @@
+"""Offline replay and parameter sweeps for the scan thresholds.
+
+Streams stored history (the `snapshots`, `tokens` and `rugcheck_verdicts` tables) or
+recorded payload files through the checks the bot runs: Filters, the FakeVolumeDetector
+heuristics, Rugcheck.detect_bundle, the stored Rugcheck verdicts and determine_status.
+Nothing touches the network. Every parameter combination reports how many trade signals
+it would have produced and how the signalled pairs' prices moved afterwards.
+
+    python replay.py --db dexscreener.db
+    python replay.py --db dexscreener.db --grid filters.min_market_cap=5e5,1e6,2e6 \\
+        --grid fake_volume.volume_liquidity_ratio=25,50,100 --jobs 8
+    python replay.py --payload scan1.json --payload scan2.json --grid bundle.max_wallets=3,5
+"""
+import argparse
+import copy
+import itertools
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import yaml
+
+from bot import BatchEvaluator, Database, DexscreenerBot, FakeVolumeDetector, Filters, Rugcheck, TokenRecord
+
+# Pair ids and timestamps share one sortable int64 key: pair * PAIR_KEY + ts
+PAIR_KEY = 10 ** 10
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+class History:
+    """Scan history as columns, one row per pair per step, ordered by step and then pair."""
+
+    def __init__(self, addresses, details, verdicts, pair, ts, columns, records=None):
+        self.addresses = addresses
+        self.details = details
+        self.verdicts = verdicts
+        self.records = records
+        self.column_cache = {}
+
+        # Step order: rows of one scan are contiguous
+        order = np.lexsort((pair, ts))
+        self.pair = pair[order]
+        self.ts = ts[order]
+        self.values = {name: values[order] for name, values in columns.items()}
+        if records is not None:
+            self.records = [records[i] for i in order]
+        bounds = np.flatnonzero(np.diff(self.ts)) + 1
+        starts = np.concatenate(([0], bounds)).astype(np.intp)
+        ends = np.concatenate((bounds, [len(self.ts)])).astype(np.intp)
+        self.steps = [(int(self.ts[start]), int(start), int(end)) for start, end in zip(starts, ends) if end > start]
+
+        # Pair order, for looking up prices after a signal
+        by_pair = np.lexsort((self.ts, self.pair))
+        self.pair_key = self.pair[by_pair].astype(np.int64) * PAIR_KEY + self.ts[by_pair]
+        self.pair_price = self.values['price'][by_pair]
+
+    def __len__(self):
+        return len(self.ts)
+
+    @staticmethod
+    def _derive(pair, ts, values, window):
+        """Average of values over [ts - window, ts) within each pair, carrying the last earlier value forward."""
+        key = pair.astype(np.int64) * PAIR_KEY + ts
+        start = np.searchsorted(key, key - window, 'left')
+        index = np.arange(len(key))
+        valid = np.isfinite(values)
+        sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0))))
+        counts = np.concatenate(([0], np.cumsum(valid)))
+        total, count = sums[index] - sums[start], counts[index] - counts[start]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            average = np.where(count > 0, total / np.maximum(count, 1), 0.0)
+        previous = np.concatenate(([np.nan], values[:-1]))
+        carried = (count == 0) & (index > 0) & (np.concatenate(([False], pair[1:] == pair[:-1])))
+        average[carried] = np.nan_to_num(previous[carried])
+        return average
+
+    @staticmethod
+    def _change(pair, ts, price, window):
+        """Percent price change against the last price at least window seconds earlier, 0 when unknown."""
+        key = pair.astype(np.int64) * PAIR_KEY + ts
+        earlier = np.searchsorted(key, key - window, 'right') - 1
+        found = (earlier >= 0) & (pair[np.maximum(earlier, 0)] == pair)
+        base = price[np.maximum(earlier, 0)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = (price / base - 1) * 100
+        return np.where(found & (base > 0) & np.isfinite(change), change, 0.0)
+
+    @classmethod
+    def from_database(cls, path, step=3600, start=0, end=None, chain='solana'):
+        db = Database(path, batch_size=0, flush_interval_ms=0)
+        try:
+            details = {row[0]: row[1:] for row in db.fetch_token_details()}
+            verdicts = {address: bool(is_good) for address, is_good in db.fetch_rugcheck_verdicts(chain)}
+            addresses, pair, rows = [], [], []
+            for chunk in db.iter_snapshots(start, end):
+                for row in chunk:
+                    if not addresses or addresses[-1] != row[0]:
+                        addresses.append(row[0])
+                    pair.append(len(addresses) - 1)
+                    rows.append(row[1:])
+        finally:
+            db.close()
+        if not rows:
+            raise ValueError(f"No snapshots in {path} for the requested period.")
+
+        pair = np.array(pair, dtype=np.int64)
+        data = np.array(rows, dtype=float)
+        ts = data[:, 0].astype(np.int64)
+        price, volume, liquidity, market_cap = data[:, 1], data[:, 2], data[:, 3], data[:, 4]
+        # Baselines come from every stored snapshot, as in the live scan
+        volume_h6 = cls._derive(pair, ts, volume, 6 * 3600)
+        price_change = cls._change(pair, ts, price, 24 * 3600)
+
+        # One row per pair per step: the last snapshot inside it
+        bucket = ts // step
+        keep = np.ones(len(ts), dtype=bool)
+        keep[:-1] = (pair[1:] != pair[:-1]) | (bucket[1:] != bucket[:-1])
+        created = np.array([_float((details.get(address) or (None,) * 5)[2]) for address in addresses])
+        pair_kept = pair[keep]
+        columns = {
+            'price': price[keep], 'market_cap': market_cap[keep], 'volume': volume[keep], 'liquidity': liquidity[keep],
+            'volume_h6': volume_h6[keep], 'trades': np.zeros(keep.sum()),
+            'price_change_24h': price_change[keep], 'pair_created_at': np.nan_to_num(created[pair_kept])
+        }
+        # All rows of a step are evaluated at the step's end
+        step_ts = np.minimum((bucket[keep] + 1) * step - 1, ts.max())
+        return cls(addresses, details, verdicts, pair_kept, step_ts, columns)
+
+    @classmethod
+    def from_payloads(cls, paths, db_path=None, chain='solana'):
+        verdicts = {}
+        if db_path:
+            db = Database(db_path, batch_size=0, flush_interval_ms=0)
+            try:
+                verdicts = {address: bool(is_good) for address, is_good in db.fetch_rugcheck_verdicts(chain)}
+            finally:
+                db.close()
+        ids, addresses, details = {}, [], {}
+        pair, ts, records = [], [], []
+        for path in paths:
+            with open(path, 'r') as file:
+                data = json.load(file)
+            pairs = (data.get('pairs') or []) if isinstance(data, dict) else data
+            recorded_at = int(data.get('recorded_at') or os.path.getmtime(path)) if isinstance(data, dict) else int(os.path.getmtime(path))
+            for raw in pairs:
+                record = TokenRecord.from_pair(raw)
+                if not record.address:
+                    continue
+                if record.address not in ids:
+                    ids[record.address] = len(addresses)
+                    addresses.append(record.address)
+                    details[record.address] = (record.name, record.symbol, record.pair_created_at, record.dev_address, record.price_change_24h)
+                pair.append(ids[record.address])
+                ts.append(recorded_at)
+                records.append(record)
+        if not records:
+            raise ValueError("No pairs in the payload files.")
+
+        pair = np.array(pair, dtype=np.int64)
+        ts = np.array(ts, dtype=np.int64)
+        order = np.lexsort((ts, pair))
+        pair, ts, records = pair[order], ts[order], [records[i] for i in order]
+        volume = np.array([_float(record.volume) for record in records])
+        volume_h6 = cls._derive(pair, ts, volume, 6 * 3600)
+        for record, baseline in zip(records, volume_h6):
+            record.volume_h6 = float(baseline)
+        columns = {'price': np.array([_float(record.price_usd) for record in records])}
+        return cls(addresses, details, verdicts, pair, ts, columns, records)
+
+    def tokens(self, start, end):
+        if self.records is not None:
+            return self.records[start:end]
+        return StepTokens(self, start, end)
+
+    def columns(self, start, end, evaluator):
+        if self.records is not None:
+            # Recorded pairs keep their raw values, so exactness is judged exactly as live
+            if start not in self.column_cache:
+                self.column_cache[start] = evaluator.columns(self.records[start:end])
+            return self.column_cache[start]
+        values = {name: column[start:end] for name, column in self.values.items()}
+        market_exact = np.isfinite(values['market_cap']) & np.isfinite(values['volume']) & np.isfinite(values['liquidity'])
+        return dict(
+            values,
+            market_exact=market_exact,
+            fake_exact=market_exact & np.isfinite(values['volume_h6']),
+            status_exact=np.isfinite(values['price_change_24h']) & np.isfinite(values['pair_created_at'])
+        )
+
+    def prices_after(self, pairs, ts):
+        """First price at or after ts for each pair, NaN when the history ends before it."""
+        key = pairs.astype(np.int64) * PAIR_KEY + ts
+        index = np.searchsorted(self.pair_key, key, 'left')
+        inside = index < len(self.pair_key)
+        index = np.minimum(index, len(self.pair_key) - 1)
+        inside &= self.pair_key[index] // PAIR_KEY == pairs
+        return np.where(inside, self.pair_price[index], np.nan)
+
+    def min_price_between(self, pair, start, end):
+        lo = np.searchsorted(self.pair_key, pair * PAIR_KEY + start, 'right')
+        hi = np.searchsorted(self.pair_key, pair * PAIR_KEY + end, 'right')
+        prices = self.pair_price[lo:hi]
+        prices = prices[np.isfinite(prices)]
+        return prices.min() if len(prices) else np.nan
+
+class StepTokens:
+    """TokenRecords for the rows of one step, built only for the rows that get looked at."""
+
+    def __init__(self, history, start, end):
+        self.history = history
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __getitem__(self, i):
+        history = self.history
+        row = self.start + i
+        address = history.addresses[history.pair[row]]
+        name, symbol, _, dev_address, _ = history.details.get(address) or (None,) * 5
+
+        def value(column):
+            number = history.values[column][row]
+            return float(number) if np.isfinite(number) else None
+
+        return TokenRecord(
+            address, name, symbol, value('market_cap'), value('volume'), value('liquidity'), value('price'),
+            value('price_change_24h'), value('pair_created_at'), trades=0, dev_address=dev_address,
+            volume_h6=value('volume_h6')
+        )
+
+def replay(history, config, horizons):
+    """Run one parameter set over the whole history; returns signal counts and forward returns."""
+    filters = config['filters']
+    # Pocket Universe is a network check; only the local heuristics are replayed
+    detector = FakeVolumeDetector(dict(config, fake_volume=dict(config.get('fake_volume', {}), pocket_universe_enabled=False)))
+    evaluator = BatchEvaluator(filters, detector, lambda token, now: Filters.determine_status(token, filters, now))
+    rugcheck = Rugcheck(config)
+    blacklist_config = config.get('blacklist', {}) or {}
+    coins = {address.lower() for address in blacklist_config.get('coins', []) or []}
+    devs = {address.lower() for address in blacklist_config.get('devs', []) or []}
+    blacklisted = np.array([
+        address.lower() in coins or str((history.details.get(address) or (None,) * 5)[3] or '').lower() in devs
+        for address in history.addresses
+    ], dtype=bool)
+
+    counts = Counter()
+    entries = {}
+    started = time.perf_counter()
+    for now, start, end in history.steps:
+        tokens = history.tokens(start, end)
+        batch = evaluator.evaluate(tokens, now, history.columns(start, end, evaluator))
+        pairs = history.pair[start:end]
+        candidates = np.flatnonzero(~blacklisted[pairs])
+        # The blacklisting checks run ahead of the filters, in the live pipeline's declared order.
+        # Snapshot rows carry no transactions, so only recorded payloads can show a bundle.
+        if history.records is not None:
+            for i in candidates:
+                is_bundle, _ = rugcheck.detect_bundle(tokens[i], now)
+                if is_bundle:
+                    counts['bundle_detected'] += 1
+                    blacklisted[pairs[i]] = True
+        for i in candidates[batch.fake_scalar[candidates]]:
+            if blacklisted[pairs[i]]:
+                continue
+            verdict = batch.fake_volume(i)
+            if verdict is not None and verdict[0]:
+                counts['fake_volume'] += 1
+                blacklisted[pairs[i]] = True
+        passed = batch.passed_filters()
+        for i in passed[~blacklisted[pairs[passed]]]:
+            pair = pairs[i]
+            if not history.verdicts.get(history.addresses[pair], True):
+                counts['rugcheck_failed'] += 1
+                blacklisted[pair] = True
+                continue
+            status, _ = batch.status(i)
+            counts[status] += 1
+            if status in DexscreenerBot.TRADE_STATUSES:
+                counts['signals'] += 1
+                if pair not in entries:
+                    entries[pair] = (history.ts[start + i], history.values['price'][start + i])
+    elapsed = time.perf_counter() - started
+
+    result = {
+        'signals': counts.pop('signals', 0),
+        'signalled_pairs': len(entries),
+        'statuses': {status: counts.pop(status, 0) for status in ('new_pair', 'pumped', 'rugged', 'stable')},
+        'blacklisted': dict(counts),
+        'seconds': elapsed,
+        'returns': {}
+    }
+    if entries:
+        pair_ids = np.fromiter(entries.keys(), dtype=np.int64)
+        entry_ts = np.array([entry[0] for entry in entries.values()], dtype=np.int64)
+        entry_price = np.array([entry[1] for entry in entries.values()], dtype=float)
+        for label, seconds in horizons:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                returns = history.prices_after(pair_ids, entry_ts + seconds) / entry_price - 1
+            returns = returns[np.isfinite(returns)]
+            result['returns'][label] = {
+                'pairs': int(len(returns)),
+                'mean': float(returns.mean()) if len(returns) else None,
+                'median': float(np.median(returns)) if len(returns) else None,
+                'win_rate': float((returns > 0).mean()) if len(returns) else None
+            }
+        # Entries that later lost 90% of their price within the longest horizon
+        longest = max(seconds for _, seconds in horizons)
+        lows = np.array([history.min_price_between(p, t, t + longest) for p, t in zip(pair_ids, entry_ts)])
+        with np.errstate(invalid='ignore'):
+            result['rugged_after'] = float(np.mean(lows < entry_price * 0.1))
+    return result
+
+def build_grid(base_config, grid):
+    """Every combination of the --grid values, applied to a copy of the config."""
+    keys = [key for key, _ in grid]
+    for values in itertools.product(*[values for _, values in grid]):
+        config = copy.deepcopy(base_config)
+        for key, value in zip(keys, values):
+            section, _, name = key.partition('.')
+            config.setdefault(section, {})[name] = value
+        yield dict(zip(keys, values)), config
+
+def parse_value(text):
+    value = yaml.safe_load(text)
+    if isinstance(value, str):
+        # YAML 1.1 reads 1e6 as a string
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return value
+
+def parse_grid(specs):
+    grid = []
+    for spec in specs:
+        key, separator, values = spec.partition('=')
+        if not separator or '.' not in key:
+            raise ValueError(f"Grid entries look like section.key=v1,v2: {spec}")
+        grid.append((key.strip(), [parse_value(value) for value in values.split(',')]))
+    return grid
+
+def parse_duration(text):
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    text = text.strip()
+    if text[-1] in units:
+        return text, int(float(text[:-1]) * units[text[-1]])
+    return f"{text}s", int(text)
+
+_history = None
+
+def _init_worker(history):
+    global _history
+    _history = history
+
+def _run(job):
+    params, config, horizons = job
+    return dict(replay(_history, config, horizons), params=params)
+
+def print_result(result, horizons):
+    params = ', '.join(f"{key}={value}" for key, value in result['params'].items()) or 'config.yaml'
+    print(f"\n{params}")
+    print(f"  {result['signals']} signals on {result['signalled_pairs']} pairs; "
+          f"statuses {result['statuses']}; blacklisted {result['blacklisted'] or {}}")
+    for label, _ in horizons:
+        outcome = result['returns'].get(label)
+        if outcome and outcome['pairs']:
+            print(f"  +{label}: mean {outcome['mean']:+.1%}, median {outcome['median']:+.1%}, "
+                  f"{outcome['win_rate']:.0%} up over {outcome['pairs']} pairs")
+    if 'rugged_after' in result:
+        print(f"  dropped 90%+ afterwards: {result['rugged_after']:.0%}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay stored scans offline and sweep the filter thresholds.")
+    parser.add_argument('--config', default='config.yaml', help="Base thresholds; --grid values override them")
+    parser.add_argument('--db', help="SQLite database to replay (snapshots, tokens, rugcheck_verdicts)")
+    parser.add_argument('--payload', action='append', default=[], help="Recorded pairs payload (JSON); repeatable")
+    parser.add_argument('--start', type=int, default=0, help="First snapshot timestamp to replay")
+    parser.add_argument('--end', type=int, help="Replay snapshots before this timestamp")
+    parser.add_argument('--step', type=int, default=3600, help="Seconds per replayed scan (database history)")
+    parser.add_argument('--grid', action='append', default=[], help="section.key=v1,v2,...; repeatable")
+    parser.add_argument('--horizons', default='1h,6h,24h', help="Forward-return horizons")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Processes for the sweep")
+    parser.add_argument('--output', default='replay_results.json', help="Where to write the JSON results")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    with open(args.config, 'r') as file:
+        base_config = yaml.safe_load(file)
+    chain = base_config.get('rugcheck', {}).get('chain', 'solana')
+
+    loading = time.perf_counter()
+    if args.payload:
+        history = History.from_payloads(args.payload, args.db, chain)
+    elif args.db:
+        history = History.from_database(args.db, args.step, args.start, args.end, chain)
+    else:
+        print("Nothing to replay: pass --db or --payload.")
+        return 2
+    print(f"Loaded {len(history)} rows for {len(history.addresses)} pairs in {len(history.steps)} steps "
+          f"({time.perf_counter() - loading:.1f}s)")
+
+    horizons = [parse_duration(text) for text in args.horizons.split(',') if text.strip()]
+    jobs = [(params, config, horizons) for params, config in build_grid(base_config, parse_grid(args.grid))]
+    sweeping = time.perf_counter()
+    if args.jobs > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(min(args.jobs, len(jobs)), initializer=_init_worker, initargs=(history,)) as pool:
+            results = list(pool.map(_run, jobs))
+    else:
+        _init_worker(history)
+        results = [_run(job) for job in jobs]
+    for result in results:
+        print_result(result, horizons)
+    print(f"\n{len(results)} combinations in {time.perf_counter() - sweeping:.1f}s")
+
+    with open(args.output, 'w') as file:
+        json.dump({'source': args.payload or args.db, 'horizons': [label for label, _ in horizons], 'results': results}, file, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
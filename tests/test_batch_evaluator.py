@@ -0,0 +1,61 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import BatchEvaluator, FakeVolumeDetector, Filters, TokenRecord
+
+NOW = 1_700_000_000.0
+FILTERS = [
+    dict(min_market_cap=1e6, max_daily_volume=5e6, min_liquidity=5e4, max_price_change=500, min_price_drop=-90, max_age_hours=24),
+    # Without the status thresholds, and with a missing filter key
+    dict(min_market_cap=1e6, max_daily_volume=5e6, min_liquidity=5e4, max_age_hours=24),
+    dict(min_market_cap=1e6, max_daily_volume=5e6, min_liquidity=5e4, max_price_change=500, min_price_drop=-90),
+    # A threshold the float columns can't take, so every row goes through the scalar path
+    dict(min_market_cap="1e6", max_daily_volume=5e6, min_liquidity=5e4, max_price_change=500, min_price_drop=-90, max_age_hours=24),
+]
+# Boundaries, NaN/inf, ints beyond 2**53, bools, strings and None
+VALUES = [
+    0, 1, -1, 0.0, -0.0, 0.5, 1e6, 1e6 - 1e-9, 2e6, 5e6, 5e4, 49999.9, 10 ** 7, 2 ** 60, True, False,
+    float('nan'), float('inf'), -95, -90, 500, 600, None, "100", "abc"
+]
+
+def outcome(check, *args):
+    try:
+        return check(*args)
+    except Exception as e:
+        return 'raised', type(e).__name__
+
+def random_tokens(rng, count):
+    created = [0, (NOW - 3600) * 1000, (NOW - 24 * 3600) * 1000, (NOW - 24 * 3600) * 1000 + 1, (NOW - 100 * 3600) * 1000,
+               2 ** 60, None, "x", float('nan')]
+    return [
+        TokenRecord(
+            f"pair{i}", market_cap=rng.choice(VALUES + [rng.uniform(-1e7, 1e7)]),
+            volume=rng.choice(VALUES + [rng.randrange(-10 ** 7, 10 ** 7)]), liquidity=rng.choice(VALUES),
+            price_change_24h=rng.choice(VALUES), pair_created_at=rng.choice(created),
+            trades=rng.choice([0, 5, 9, 10, 20, None, 2 ** 60]), volume_h6=rng.choice(VALUES)
+        )
+        for i in range(count)
+    ]
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_matches_scalar_checks(filters):
+    rng = random.Random(5)
+    detector = FakeVolumeDetector({
+        'fake_volume': {'volume_liquidity_ratio': 50, 'volume_spike_threshold': 1000, 'min_trades_for_spike': 10},
+        'dexscreener': {}
+    })
+    evaluator = BatchEvaluator(filters, detector, lambda token, now=None: Filters.determine_status(token, filters, now))
+    tokens = random_tokens(rng, 5000)
+    batch = evaluator.evaluate(tokens, NOW)
+    passed = set(batch.passed_filters().tolist())
+    for i, token in enumerate(tokens):
+        expected_filters = outcome(Filters.apply_filters, token, filters)
+        assert outcome(batch.filters, i) == expected_filters, i
+        assert (i in passed) == (expected_filters[0] is True), i
+        assert outcome(batch.status, i) == outcome(Filters.determine_status, token, filters, NOW), i
+        assert outcome(batch.fake_volume, i) == outcome(detector.check_heuristics, token), i
@@ -0,0 +1,62 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import BundleWindow
+
+WINDOW = 60
+MIN_PERCENTAGE = 2
+TOTAL_SUPPLY = 1e6
+
+def recompute(observed, now):
+    """Significant wallets over every distinct transaction observed so far."""
+    totals = {}
+    for tx in observed.values():
+        if now - tx['timestamp'] / 1000 > WINDOW:
+            continue
+        totals[tx['buyer_wallet']] = totals.get(tx['buyer_wallet'], 0) + tx['amount']
+    return sum(1 for amount in totals.values() if amount / TOTAL_SUPPLY * 100 >= MIN_PERCENTAGE)
+
+def scans(rng, jitter):
+    now = 1_700_000_000.0
+    history = []
+    for _ in range(40):
+        now += rng.uniform(0.5, 10)
+        for _ in range(rng.randrange(4)):
+            history.append({
+                'hash': f"tx{len(history)}",
+                'buyer_wallet': f"wallet{rng.randrange(8)}",
+                'amount': TOTAL_SUPPLY * rng.choice([0.005, 0.01, 0.02]),
+                'timestamp': int((now - rng.uniform(0, jitter)) * 1000)
+            })
+        # Each scan lists a random slice of the most recent buys, possibly out of order
+        recent = history[-rng.randrange(1, 12):] if history else []
+        recent = rng.sample(recent, rng.randrange(len(recent) + 1))
+        yield now, recent
+
+@pytest.mark.parametrize('jitter', [0, 2, 30])
+def test_matches_full_recompute(jitter):
+    rng = random.Random(jitter)
+    for _ in range(200):
+        window = BundleWindow(WINDOW, MIN_PERCENTAGE)
+        window.set_total_supply(TOTAL_SUPPLY)
+        observed = {}
+        for now, recent in scans(rng, jitter):
+            for tx in recent:
+                observed[tx['hash']] = tx
+            window.add(recent, now)
+            window.expire(now)
+            assert window.significant == recompute(observed, now)
+
+def test_repeated_listing_counts_once():
+    window = BundleWindow(WINDOW, MIN_PERCENTAGE)
+    window.set_total_supply(TOTAL_SUPPLY)
+    tx = {'hash': 'a', 'buyer_wallet': 'w', 'amount': TOTAL_SUPPLY * 0.015, 'timestamp': 1_000_000}
+    window.add([tx], 1000)
+    window.add([tx, dict(tx)], 1001)
+    assert window.significant == 0
+    assert len(window.buys) == 1
@@ -0,0 +1,104 @@
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot
+from bot import CircuitBreaker, CircuitOpenError, HttpClient, is_unavailable
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(bot.time, 'monotonic', lambda: now[0])
+    return now
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    # A success in between starts the count over
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+def test_half_open_lets_one_probe_through_per_window(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 29.9
+    assert not breaker.allow()
+    clock[0] += 0.1
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # A failed probe keeps it open for another window
+    breaker.record_failure()
+    clock[0] += 29.9
+    assert not breaker.allow()
+    clock[0] += 0.1
+    assert breaker.allow()
+
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
+
+class Session:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        response = requests.Response()
+        response.status_code = self.statuses.pop(0)
+        response.url = url
+        return response
+
+def test_client_trips_per_host_on_5xx_and_429(clock):
+    client = HttpClient({'circuit_breaker': {'failure_threshold': 2, 'reset_timeout': 30}})
+    client.session = Session([500, 429, 404, 200])
+    client.get('http://a.test/x')
+    client.get('http://a.test/x')
+    with pytest.raises(CircuitOpenError) as error:
+        client.get('http://a.test/x')
+    assert is_unavailable(error.value)
+    assert client.session.calls == 2
+
+    # 4xx answers don't count against another host
+    assert client.get('http://b.test/x').status_code == 404
+    assert client.get('http://b.test/x').status_code == 200
+
+def test_unavailable_errors():
+    assert is_unavailable(requests.Timeout('slow'))
+    rate_limited = requests.Response()
+    rate_limited.status_code = 429
+    assert is_unavailable(requests.HTTPError(response=rate_limited))
+    server_error = requests.Response()
+    server_error.status_code = 500
+    assert not is_unavailable(requests.HTTPError(response=server_error))
+    assert not is_unavailable(requests.ConnectionError('refused'))
+
+class Cache:
+    def __init__(self):
+        self.stored = []
+
+    def get(self, chain, address):
+        return None
+
+    def put(self, chain, address, is_good, details):
+        self.stored.append(address)
+
+def test_rugcheck_has_no_verdict_while_the_circuit_is_open(clock):
+    client = HttpClient({'circuit_breaker': {'failure_threshold': 1, 'reset_timeout': 30}})
+    client.session = Session([503])
+    cache = Cache()
+    rugcheck = bot.Rugcheck({'rugcheck': {'api_url': 'http://rugcheck.test', 'api_key': 'key'}}, client, cache)
+    # A real error answer still rejects, as before the breaker existed
+    assert rugcheck.check_token('first')[0] is False
+    is_good, details = rugcheck.check_token('second')
+    assert is_good is None and details.startswith('API unavailable')
+    assert cache.stored == [] and client.session.calls == 1
@@ -0,0 +1,47 @@
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import Database
+
+def open_database(tmp_path):
+    db = Database(str(tmp_path / 'test.db'), batch_size=100, flush_interval_ms=0)
+    db.conn.execute('PRAGMA busy_timeout=0')
+    return db
+
+def test_busy_commit_is_requeued_in_order(tmp_path):
+    db = open_database(tmp_path)
+    other = sqlite3.connect(str(tmp_path / 'test.db'))
+    try:
+        other.execute('BEGIN EXCLUSIVE')
+        db.insert_pattern('a', 'new_pair', 'first')
+        db.insert_pattern('b', 'new_pair', 'second')
+        assert db.flush() == 0
+        assert db.pending_rows == 2
+        assert db.write_errors == 1 and db.rows_dropped == 0
+
+        # Rows queued while the database was locked follow the requeued ones
+        db.insert_pattern('c', 'new_pair', 'third')
+        other.rollback()
+        assert db.flush() == 3
+        assert [row[1] for row in db.fetch_patterns()] == ['a', 'b', 'c']
+        assert db.rows_written == 3 and db.pending_rows == 0
+    finally:
+        other.close()
+        db.close()
+
+def test_unwritable_row_drops_only_itself(tmp_path):
+    db = open_database(tmp_path)
+    try:
+        db.insert_pattern('a', 'new_pair', 'ok')
+        db.insert_pattern('b', 'rugcheck_failed', {'details': 'not a string'})
+        db.append_blacklist_journal('coin', 'c', 'Fake volume')
+        db.insert_pattern('d', 'pumped', 'ok')
+        assert db.flush() == 3
+        assert [row[1] for row in db.fetch_patterns()] == ['a', 'd']
+        assert db.fetch_blacklist_journal('coin') == ['c']
+        assert db.rows_written == 3 and db.rows_dropped == 1
+    finally:
+        db.close()
@@ -0,0 +1,95 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import Poller, TokenBucket
+
+class Response:
+    def __init__(self, status_code, pairs=None, etag=None):
+        self.status_code = status_code
+        self.body = json.dumps({'pairs': pairs or []}).encode('utf-8')
+        self.headers = {'ETag': etag} if etag else {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=1):
+        # Small chunks so pairs straddle chunk boundaries
+        for position in range(0, len(self.body), 7):
+            yield self.body[position:position + 7]
+
+class Server:
+    """Endpoints with fixed pair lists that honour If-None-Match."""
+
+    def __init__(self, lists):
+        self.lists = lists
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append((url, dict(headers or {})))
+        etag = f'"{url}-v1"'
+        if (headers or {}).get('If-None-Match') == etag:
+            return Response(304)
+        return Response(200, self.lists[url], etag)
+
+def pair(address):
+    return {'pairAddress': address, 'priceUsd': '1.0'}
+
+def make_poller(server):
+    return Poller(server, list(server.lists), TokenBucket(1000), buffer_size=4, max_workers=2)
+
+def test_pairs_listed_by_several_endpoints_are_yielded_once():
+    server = Server({
+        'http://dex.test/a': [pair('p1'), pair('p2'), pair('p3')],
+        'http://dex.test/b': [pair('p2'), pair('p4'), pair('p1')]
+    })
+    poller = make_poller(server)
+    try:
+        addresses = [item['pairAddress'] for item in poller.poll()]
+        assert sorted(addresses) == ['p1', 'p2', 'p3', 'p4']
+    finally:
+        poller.close()
+
+def test_unchanged_endpoint_answers_304_and_keeps_its_validators():
+    server = Server({'http://dex.test/a': [pair('p1')], 'http://dex.test/b': [pair('p2')]})
+    poller = make_poller(server)
+    try:
+        assert len(poller.poll()) == 2
+        assert all('If-None-Match' not in headers for _, headers in server.requests)
+
+        server.requests.clear()
+        assert poller.poll() == []
+        assert all(headers.get('If-None-Match') == f'"{url}-v1"' for url, headers in server.requests)
+        assert poller.stats() == {'requests': 4, 'not_modified': 2, 'errors': 0}
+
+        # A 304 leaves the stored validators alone, so the next poll is conditional again
+        server.requests.clear()
+        assert poller.poll() == []
+        assert all(headers.get('If-None-Match') for _, headers in server.requests)
+        assert poller.stats()['not_modified'] == 4
+    finally:
+        poller.close()
+
+def test_stream_pairs_batches_addresses():
+    server = Server({})
+    poller = Poller(server, [], TokenBucket(1000), pairs_url='http://dex.test/pairs/solana/')
+    addresses = [f"p{i}" for i in range(Poller.PAIRS_PER_REQUEST + 1)]
+    server.lists = {
+        f"http://dex.test/pairs/solana/{','.join(addresses[:Poller.PAIRS_PER_REQUEST])}": [pair(a) for a in addresses[:-1]],
+        f"http://dex.test/pairs/solana/{addresses[-1]}": [pair(addresses[-1])]
+    }
+    try:
+        assert sorted(item['pairAddress'] for item in poller.stream_pairs(addresses)) == sorted(addresses)
+        assert len(server.requests) == 2
+        # Per-address lookups never keep validators
+        assert poller.validators == {}
+    finally:
+        poller.close()
@@ -0,0 +1,52 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import RescanScheduler
+
+def test_status_sets_the_interval_and_is_remembered():
+    scheduler = RescanScheduler({'stable': 100})
+    scheduler.schedule('a', 'stable', 0)
+    scheduler.schedule('b', 'new_pair', 0)
+    scheduler.schedule('c', None, 0)
+    assert scheduler.due == {'a': 100, 'b': 5, 'c': 300}
+    # A rescan that gives no status keeps the pair's last one
+    scheduler.schedule('a', None, 50)
+    assert scheduler.due['a'] == 150
+
+def test_rescheduled_and_forgotten_entries_are_skipped_on_pop():
+    scheduler = RescanScheduler({'stable': 100, 'new_pair': 5})
+    scheduler.schedule('a', 'stable', 0)
+    scheduler.schedule('b', 'stable', 0)
+    scheduler.schedule('c', 'new_pair', 0)
+    # Moves a from 100 to 5; the old heap entry stays behind
+    scheduler.schedule('a', 'new_pair', 0)
+    scheduler.forget('c')
+    assert len(scheduler.heap) == 4 and len(scheduler) == 2
+    assert scheduler.next_due() == 5
+    assert scheduler.pop_due(99) == ['a']
+    assert scheduler.pop_due(1000) == ['b']
+    assert scheduler.pop_due(1000) == [] and scheduler.next_due() is None
+
+def test_pop_is_limited_and_most_overdue_first():
+    scheduler = RescanScheduler(max_due=2)
+    for address, now in (('a', 30), ('b', 10), ('c', 20)):
+        scheduler.schedule(address, 'new_pair', now)
+    assert scheduler.pop_due(100) == ['b', 'c']
+    assert scheduler.pop_due(100) == ['a']
+
+def test_compaction_bounds_the_heap_without_changing_the_order():
+    rng = random.Random(0)
+    scheduler = RescanScheduler({'stable': 100, 'new_pair': 5})
+    addresses = [f"pair{i}" for i in range(50)]
+    for step in range(5000):
+        scheduler.schedule(rng.choice(addresses), rng.choice(['stable', 'new_pair']), step)
+        assert len(scheduler.heap) <= 2 * len(scheduler.due) + 1024
+    expected = sorted((due, address) for address, due in scheduler.due.items())
+    popped = []
+    for due, _ in expected:
+        popped += scheduler.pop_due(due)
+    assert popped == [address for _, address in expected]
+    assert len(scheduler) == 0
@@ -0,0 +1,58 @@
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import benchmark
+from bot import DexscreenerBot
+
+def scan_once(pairs, workers, queue_size=2, chunk_size=5):
+    """One scan of pairs split over two endpoints; returns (pairs processed, stored token addresses)."""
+    args = benchmark.parse_args([
+        '--config', os.path.join(ROOT, 'config.yaml'), '--workers', str(workers), '--endpoints', '2',
+        '--rugcheck-latency', '0', '--pocket-universe-latency', '0', '--telegram-latency', '0'
+    ])
+    payloads = [json.dumps({'pairs': pairs[i::2]}).encode('utf-8') for i in range(2)]
+    workdir = tempfile.mkdtemp(prefix='dexscanner-test-')
+    stubs = benchmark.start_stubs(args)
+    stubs['dexscreener'] = benchmark.StubServer('dexscreener', lambda path, body: payloads[int(path.rsplit('/', 1)[-1])])
+    path = benchmark.write_config(args, workdir, stubs)
+    with open(path, 'r') as file:
+        config = yaml.safe_load(file)
+    config['sharding']['queue_size'] = queue_size
+    config['dexscreener']['stream_chunk_size'] = chunk_size
+    with open(path, 'w') as file:
+        yaml.dump(config, file)
+
+    bot = DexscreenerBot(path)
+    processed = []
+    try:
+        scan = threading.Thread(target=lambda: processed.append(bot.scan()), daemon=True)
+        scan.start()
+        scan.join(60)
+        assert not scan.is_alive(), "scan deadlocked"
+        bot.flush()
+    finally:
+        if processed or bot.shards is None:
+            bot.close()
+        else:
+            for process in bot.shards.workers + [bot.shards.writer]:
+                process.terminate()
+        for stub in stubs.values():
+            stub.close()
+    with sqlite3.connect(config['database']['name']) as conn:
+        return processed[0], sorted(row[0] for row in conn.execute('SELECT address FROM tokens'))
+
+def test_workers_forwarding_to_each_other_do_not_deadlock():
+    # Both workers fetch at once and each forwards far more chunks than a peer inbox holds
+    pairs = benchmark.synthetic_pairs(1000)
+    processed, tokens = scan_once(pairs, workers=2)
+    assert processed == len(pairs)
+    assert tokens == scan_once(pairs, workers=0)[1]
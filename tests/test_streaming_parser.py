@@ -0,0 +1,58 @@
+import json
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import StreamingPairParser
+
+DOCUMENTS = [
+    {'count': 12.5, 'pairs': [{'a': 1}]},
+    {'pairs': [{'priceUsd': '0.00001234', 'marketCap': 1.5e6, 'volume': {'h24': -3.25e-4}}, 7, -0.5, True, None]},
+    {'schemaVersion': '1.0.0', 'total': 1234567, 'pairs': [{'name': 'Tökén ☃ "quoted"', 'n': 1e10}, [1, [2.75]]], 'after': 42},
+    {'pairs': [], 'count': 0},
+    {'other': {'pairs': [1]}, 'pairs': [123456789, 0.1, 'x'], 'tail': [False, None]},
+]
+
+def split(data, sizes):
+    chunks, position = [], 0
+    for size in sizes:
+        chunks.append(data[position:position + size])
+        position += size
+    chunks.append(data[position:])
+    return chunks
+
+@pytest.mark.parametrize('document', DOCUMENTS)
+@pytest.mark.parametrize('indent', [None, 1])
+def test_every_two_chunk_split_matches_json_loads(document, indent):
+    data = json.dumps(document, indent=indent, ensure_ascii=False).encode('utf-8')
+    parser = StreamingPairParser()
+    for cut in range(len(data) + 1):
+        assert list(parser.iter_items([data[:cut], data[cut:]])) == document['pairs'], cut
+
+@pytest.mark.parametrize('document', DOCUMENTS)
+def test_single_byte_chunks_match_json_loads(document):
+    data = json.dumps(document, ensure_ascii=False).encode('utf-8')
+    assert list(StreamingPairParser().iter_items(split(data, [1] * len(data)))) == document['pairs']
+
+def test_number_split_before_its_fraction():
+    chunks = [b'{"count": 12.', b'5, "pairs": [{"a":1}]}']
+    assert list(StreamingPairParser().iter_items(chunks)) == [{'a': 1}]
+
+def test_random_chunk_sizes():
+    rng = random.Random(0)
+    for _ in range(300):
+        pairs = [
+            {'price': rng.uniform(-1e6, 1e6), 'exp': rng.random() * 10 ** rng.randrange(-30, 30), 'n': rng.randrange(-10 ** 12, 10 ** 12)}
+            for _ in range(rng.randrange(5))
+        ]
+        data = json.dumps({'count': rng.uniform(0, 100), 'pairs': pairs, 'after': rng.random()}).encode('utf-8')
+        sizes = [rng.randrange(1, 64) for _ in range(len(data))]
+        assert list(StreamingPairParser().iter_items(split(data, sizes))) == json.loads(data)['pairs']
+
+def test_truncated_stream_raises():
+    with pytest.raises(ValueError):
+        list(StreamingPairParser().iter_items([b'{"pairs": [{"a": 1}, {"b":']))